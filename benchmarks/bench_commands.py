@@ -0,0 +1,222 @@
+"""
+Benchmarks of the hot commands against a synthetic novel.
+
+    python benchmarks/bench_commands.py [--scenes N] [--depth N] [--words N] [--header-lines N]
+                                        [--repeat N] [--output FILE]
+
+The book package has to be importable (`pipenv install` installs it in editable mode).
+
+A novel is generated with `synthetic.generate` in a temporary directory, then stats, a session
+tick, word counting, `new` ID allocation, rename planning, a dry-run transform and compile to
+markdown are timed, as well as a whole `book stats` process including its start-up.  `count
+str.split` is the bare `str.split()` count the word count rules replaced; `count plain` should
+stay level with it.  Cold cases run with the
+`.book` caches removed first.  Results are printed and written as JSON (to `--output` or
+stdout) together with the parameters and the current git commit, so runs on different commits
+can be compared.  Runs offline and never calls pandoc.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import book.compile as compiler
+import book.manifest as manifest
+import book.rename as rename
+import book.session as sess
+import book.stats as stats
+import book.structure as struct
+import book.transform as transform
+import book.wordcount as wordcount
+
+import synthetic
+
+
+def measure(fx, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fx()
+        times.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "max": max(times),
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def get_cases(path, build_dir):
+    novel = struct.Novel(path)
+    outline_path = novel.outline_path
+    book_dir = os.path.join(path, manifest.BOOK_DIR)
+
+    def drop_caches():
+        shutil.rmtree(book_dir, ignore_errors=True)
+
+    def drop_build():
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.makedirs(build_dir)
+
+    def run_stats():
+        root = struct.Novel(path).snapshot()
+        stats.render(root, stats.CSV, out=io.StringIO())
+
+    session = sess.Session(struct.Novel(path), 1000, None)
+    scene_path = next(struct.Novel(path).snapshot().scenes()).file_path
+
+    scene_paths = [scene.file_path for scene in struct.Novel(path).snapshot().scenes()]
+
+    def count_plain():
+        for scene_path in scene_paths:
+            wordcount.count_file(scene_path)
+
+    def count_split():
+        # What counting cost before the word count rules: the reference for `count plain`.
+        for scene_path in scene_paths:
+            with open(scene_path) as fp:
+                len(fp.read().split("\n\n", 1)[-1].split())
+
+    def session_edit():
+        with open(scene_path, "a") as fp:
+            fp.write("more words\n")
+
+    def session_tick():
+        session.refresh()
+        session.commit()
+
+    def cli_stats():
+        # Interpreter start-up and imports included, like an editor plugin calling `book stats`.
+        subprocess.run(
+            [sys.executable, "-c", "import book; book.main()", "stats", path],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+
+    new_scenes = iter(range(900, 10**6))
+
+    def new_scene():
+        # Like `book new`: allocate an ID, create the scene and record it in the manifest.
+        scene_path = os.path.join(outline_path, f"{next(new_scenes)}-bench_new.md")
+        struct.Novel(path).add_node(struct.Scene, scene_path)
+
+    def compile_markdown():
+        novel = struct.Novel(path)
+        cache = compiler.BuildCache(build_dir)
+        cache.build_markdown(
+            os.path.join(build_dir, "single_file.md"),
+            novel.compile_frontmatter(),
+            novel.snapshot().walk(),
+            novel.compile_backmatter(),
+        )
+        cache.save()
+
+    return [
+        ("stats cold", run_stats, drop_caches),
+        ("stats warm", run_stats, None),
+        ("cli stats", cli_stats, None),
+        ("count plain", count_plain, None),
+        ("count str.split", count_split, None),
+        ("session tick idle", session_tick, None),
+        ("session tick edit", session_tick, session_edit),
+        ("new id", new_scene, None),
+        ("rename plan", lambda: rename.plan(struct.Outline(outline_path)), None),
+        (
+            "transform dry-run",
+            lambda: transform.run(
+                struct.Outline(outline_path),
+                ["trailing-whitespace", "em-dashes", "smart-quotes"],
+                dry_run=True,
+            ),
+            None,
+        ),
+        ("compile markdown cold", compile_markdown, drop_build),
+        ("compile markdown warm", compile_markdown, None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--scenes", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--words", type=int, default=1000)
+    parser.add_argument("--header-lines", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", "-o", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    params = {
+        "scenes": args.scenes,
+        "depth": args.depth,
+        "words": args.words,
+        "header_lines": args.header_lines,
+        "fanout": args.fanout,
+        "repeat": args.repeat,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "novel")
+        synthetic.generate(
+            path,
+            scenes=args.scenes,
+            depth=args.depth,
+            words=args.words,
+            header_lines=args.header_lines,
+            fanout=args.fanout,
+        )
+        build_dir = os.path.join(tmp_dir, "build")
+        os.makedirs(build_dir)
+
+        print(f"{'case':<24} {'min ms':>9} {'mean ms':>9}", file=sys.stderr)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cases = get_cases(path, build_dir)
+        for name, fx, setup in cases:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = measure(fx, args.repeat, setup)
+            print(
+                f"{name:<24} {results[name]['min'] * 1000:>9.1f} "
+                f"{results[name]['mean'] * 1000:>9.1f}",
+                file=sys.stderr,
+            )
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of the word counting engine against the old `len(body.split())` path.
+
+    python benchmarks/bench_wordcount.py [--words N] [--repeat N]
+
+The book package has to be importable (`pipenv install` installs it in editable mode).
+
+Times and peak allocations are printed per counting path.  Runs offline, writes only to a
+temporary directory.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import book.wordcount as wordcount
+
+VOCABULARY = (
+    "the a night storm **dark** well-known — said she he *quietly* and of to was "
+    "ship harbour lantern rain _wind_ ran toward door"
+).split()
+
+
+def make_body(words, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(20, 120))
+        lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(length)))
+        remaining -= length
+        if rng.random() < 0.05:
+            lines.append(f"# Heading {len(lines)}")
+    return "\n\n".join(lines) + "\n"
+
+
+def measure(fx, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fx()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    # Separate run, tracemalloc slows everything down.
+    tracemalloc.start()
+    fx()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--words", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = make_body(args.words)
+    markdown = wordcount.get_rules(wordcount.MARKDOWN)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "1-scene.md")
+        with open(path, "w") as fp:
+            fp.write(f"title:  bench\nID:  1\n\n{body}")
+
+        cases = [
+            ("split", lambda: len(body.split())),
+            ("count_words plain", lambda: wordcount.count_words(body)),
+            ("count_words markdown", lambda: wordcount.count_words(body, markdown)),
+            ("count_file plain", lambda: wordcount.count_file(path)),
+            ("count_file markdown", lambda: wordcount.count_file(path, markdown)),
+        ]
+        print(f"{'path':<22} {'words':>9} {'ms':>9} {'peak KiB':>9}")
+        for name, fx in cases:
+            count, elapsed, peak = measure(fx, args.repeat)
+            print(f"{name:<22} {count:>9} {elapsed * 1000:>9.1f} {peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Deterministic generator for synthetic novels.
+
+    python benchmarks/synthetic.py PATH [--scenes N] [--depth N] [--words N] [--header-lines N]
+
+The same arguments and seed always produce the same tree, byte for byte, so benchmark runs on
+different commits measure the same input.  Scenes are spread evenly over `depth` levels of
+folders with `fanout` folders per level; IDs are numbered in creation order.
+"""
+
+import argparse
+import collections
+import os
+import random
+
+import book.metadata as mdata
+import book.structure as struct
+
+VOCABULARY = (
+    'the a night storm **dark** well-known -- said she he *quietly* and of to was '
+    'ship harbour lantern rain _wind_ ran toward door "Go" "Wait," it\'s'
+).split()
+
+
+def make_body(rng, words):
+    lines = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(20, 120))
+        line = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        if rng.random() < 0.1:
+            line += "  "  # something for the trailing-whitespace transform
+        lines.append(line)
+        remaining -= length
+        if rng.random() < 0.05:
+            lines.append(f"# Heading {len(lines)}")
+    return "\n\n".join(lines) + "\n"
+
+
+def write_node(file_path, title, pk, rng, header_lines, words, structure=None):
+    header = mdata.DEFAULT_METADATA.copy()
+    header[mdata.TITLE] = title
+    header[mdata.ID] = pk
+    if structure is not None:
+        header[mdata.STRUCTURE] = structure
+    for idx in range(header_lines):
+        header[f"note{idx}"] = f"synthetic header line {idx}"
+    body = make_body(rng, words) if words else ""
+    with open(file_path, "w") as fp:
+        fp.write("\n\n".join([mdata.dict_to_metadata_string(header), body]))
+
+
+def generate(path, scenes=500, depth=2, words=1000, header_lines=4, fanout=4, seed=1):
+    """
+    Create a novel at `path` with `scenes` scenes of about `words` words each and return it.
+
+    `header_lines` extra metadata lines are added to every header.  Folders nest `depth` levels
+    deep, `fanout` per level, and the scenes are dealt out to the deepest folders in order.
+    """
+    rng = random.Random(seed)
+    novel = struct.Novel.create(path)
+    pk = 1  # the outline itself
+
+    leaves = [novel.outline_path]
+    for level in range(depth):
+        next_leaves = []
+        for parent in leaves:
+            for order in range(1, fanout + 1):
+                folder_path = os.path.join(parent, f"{order}-part_{level}_{order}")
+                os.makedirs(folder_path)
+                pk += 1
+                write_node(
+                    os.path.join(folder_path, struct.Folder.DEFAULT_FILENAME),
+                    f"Part {level}.{order}",
+                    pk,
+                    rng,
+                    header_lines,
+                    0,
+                    structure=mdata.CHAPTER if level == 0 else None,
+                )
+                next_leaves.append(folder_path)
+        leaves = next_leaves
+
+    orders = collections.Counter()
+    for idx in range(scenes):
+        parent = leaves[idx * len(leaves) // scenes]
+        orders[parent] += 1
+        pk += 1
+        write_node(
+            os.path.join(parent, f"{orders[parent]}-scene_{idx}.md"),
+            f"Scene {idx}",
+            pk,
+            rng,
+            header_lines,
+            words,
+        )
+    return novel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("path")
+    parser.add_argument("--scenes", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--words", type=int, default=1000)
+    parser.add_argument("--header-lines", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    generate(
+        args.path,
+        scenes=args.scenes,
+        depth=args.depth,
+        words=args.words,
+        header_lines=args.header_lines,
+        fanout=args.fanout,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,28 @@
 """
 Main file of the package.  Kicks off the subcommands.
+
+Only what every subcommand needs is imported up front.  `session` (git, tiddlywiki_parser) and
+`prompter` are imported by the subcommands that use them, and so are `library` (process pools)
+and the `serve` daemon, so that a quick `book stats` doesn't pay for them.  Asking a running
+daemon only needs the small `serve` client.
 """
 
+import json
 import logging
 import os
+import signal
 import sys
-import time
-
-import prompter
 
 import book.cli as cli
-import book.session as sess
 import book.structure as struct
 import book.fs_utils as fs_utils
+import book.profiling as profiling
 import book.compile
 import book.config as config
+import book.rename as rename
+import book.stats as stats
+import book.transform as transform
 
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
@@ -35,8 +41,16 @@ def main():
         cli.TRANSFORM: show_transform,
         cli.WORK: show_work,
         cli.COMPILE: show_compile,
+        cli.FIND: show_find,
+        cli.LIBRARY: show_library,
+        cli.SERVE: show_serve,
+        cli.COUNT: show_count,
     }
     args = arg_parser()
+    logging.basicConfig(
+        stream=sys.stdout, level=logging.DEBUG if args.verbose else logging.WARNING
+    )
+    start_profiling(args)
     fx = mapping.get(args.command)
     if fx is None:
         show_stats(args)
@@ -44,19 +58,87 @@ def main():
         fx(args)
 
 
-def show_stats(args):
-    outline = struct.Outline(args.path)
-    outline.reload_dir()
-    if args.folder:
-        for scene in outline.folders(recursive=True):
-            print(f"{scene.order:02d}, {scene.count:>5}, {scene.title}")
+def start_profiling(args):
+    """
+    Turn on profiling for `--profile`/`--cprofile`, or when `BOOK_PROFILE` is set, which is
+    handy for a long running `session`.  `BOOK_PROFILE=1` prints the summary at exit, any other
+    value is a file to append it to.
+    """
+    env = os.environ.get(profiling.ENV_VAR)
+    out = args.profile_out
+    if env and env != "1" and out is None:
+        out = env
+    if args.profile or args.cprofile or env or out:
+        profiling.start(out=out, cprofile_path=args.cprofile)
+
+
+def ask_server(args, command, **request_args):
+    """
+    Result of `command` from the `book serve` daemon of the novel at `args.path`, or None when
+    the work has to be done locally: no daemon, `--no-serve`, or profiling (which is meant to
+    measure the local work).  An error reply is printed and exits.
+    """
+    if getattr(args, "no_serve", False) or profiling.is_enabled():
+        return None
+    import book.serve as serve
+
+    reply = serve.request(args.path, command, request_args)
+    if reply is None:
+        return None
+    if not reply["ok"]:
+        print(reply["error"])
+        sys.exit(1)
+    return reply["result"]
 
-    else:
-        for scene in outline.scenes(recursive=True):
-            print(f"{scene.order:02d}, {scene.count:>5}, {scene.title}")
 
-    print(f"count = {outline.count}")
-    print(f"max pk = {outline.max_pk}")
+def show_stats(args):
+    fmt = getattr(args, "format", stats.TEXT)
+    text = ask_server(args, "stats", format=fmt, folder=args.folder)
+    if text is not None:
+        print(text, end="")
+        return
+    root = struct.get_novel(args.path).snapshot()
+    stats.render(root, fmt, folders=args.folder)
+
+
+def show_count(args):
+    count = ask_server(args, "count")
+    if count is None:
+        count = struct.get_novel(args.path).snapshot().count
+    print(count)
+
+
+def show_find(args):
+    result = ask_server(args, "find", ID=args.ID)
+    if result is None:
+        novel = struct.get_novel(args.path)
+        result = {
+            "path": novel.lookup(args.ID),
+            "duplicates": novel.index.duplicates.get(args.ID, [])[1:],
+        }
+    if result["path"] is None:
+        print(f"ID {args.ID} not found.")
+        sys.exit(1)
+    print(result["path"])
+    for duplicate in result["duplicates"]:
+        print(f"duplicate: {duplicate}")
+
+
+def show_serve(args):
+    import book.serve as serve
+    import book.watcher
+
+    novel = struct.get_novel(args.path)
+    server = serve.Server(novel, book.watcher.get_watcher(novel.outline_path))
+    print(f"serving {args.path} on {server.socket_path}")
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    try:
+        server.run()
+    except serve.ServeError as exc:
+        print(exc)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
 
 
 def show_new(args):
@@ -67,6 +149,12 @@ def show_new(args):
     elif os.path.exists(args.path) and not args.convert:
         print("Novel, folder or scene already exists.")
     else:
+        result = ask_server(
+            args, "new", path=os.path.abspath(args.path), convert=args.convert
+        )
+        if result is not None:
+            print(f"new {result['kind']} {args.path} in novel {novel_path}")
+            return
         if os.path.splitext(args.path)[1] in (".md", ".txt"):
             new_scene(novel_path, args.path, args.convert)
         else:
@@ -83,10 +171,8 @@ def new_folder(novel_path, folder_path, convert):
         print(f"New folders must have an order num (12-new_folder)")
     else:
         print(f"new folder {folder_path} in novel {novel_path}")
-        outline = struct.Novel(novel_path).outline
         title = fs_utils.title_from_path(folder_path)
-        ID = outline.max_pk + 1
-        struct.Folder.create(folder_path, convert, title=title, ID=ID)
+        struct.get_novel(novel_path).add_node(struct.Folder, folder_path, convert, title)
 
 
 def new_scene(novel_path, scene_path, convert):
@@ -94,66 +180,103 @@ def new_scene(novel_path, scene_path, convert):
         print(f"New scenes must have an order num (12-new_scene)")
     else:
         print(f"new scene {scene_path} in novel {novel_path}")
-        outline = struct.Novel(novel_path).outline
         title = fs_utils.title_from_path(scene_path)
-        ID = outline.max_pk + 1
-        struct.Scene.create(scene_path, convert, title=title, ID=ID)
+        struct.get_novel(novel_path).add_node(struct.Scene, scene_path, convert, title)
 
 
 def show_work(args):
-    outline = struct.Outline(args.path)
-    pre_changes = outline.auto_rename(dry_run=True)
-    for change in pre_changes:
-        if change[0] != change[1]:
-            print("----" + change[0])
-            print("++++" + change[1])
-    if not args.dry_run:
+    import prompter
+
+    rename_plan = rename.plan(struct.Outline(args.path))
+    for change in rename_plan.changes:
+        print("----" + change.old)
+        print("++++" + change.new)
+    if not args.dry_run and rename_plan.changes:
         if prompter.yesno("Rename these files?"):
-            outline.auto_rename(args.dry_run)
+            try:
+                rename.apply(rename_plan)
+            except rename.RenameError as exc:
+                print(exc)
+                return
             print("Files renamed.")
 
 
 def show_session(args):
+    import book.session as sess
+    import book.watcher as watcher
+
     def run(session):
         cached = ""
         if not session.is_changed:
             cached = " (cached)"
+        push = ""
+        if session.push_status:
+            push = f" {session.push_status};"
         print(
-            f" {session.count}/{session.goal} - Session; {session.start} start; {session.total_count} total; {cached}                ",
+            f" {session.count}/{session.goal} - Session; {session.start} start; {session.total_count} total;{push} {cached}                ",
             end="\r",
         )
 
     conf = config.get_config(args.path)
-    novel = struct.Novel(args.path)
-    session = sess.Session(novel, args.goal, args.start, tiddlywiki=conf.tiddlywiki)
-    while True:
-        run(session)
-        session.commit()
-        time.sleep(10)
+    novel = struct.get_novel(args.path, conf)
+    session = sess.Session(
+        novel,
+        args.goal,
+        args.start,
+        tiddlywiki=conf.tiddlywiki,
+        watcher=watcher.get_watcher(novel.outline_path),
+    )
+    try:
+        while True:
+            run(session)
+            session.commit()
+            session.wait(10)
+    finally:
+        session.close(timeout=10)
 
 
 def show_rename(args):
-    outline = struct.Outline(args.path)
-    pre_changes = outline.auto_rename(dry_run=True)
-    for change in pre_changes:
-        if change[0] != change[1]:
-            print("----" + change[0])
-            print("++++" + change[1])
-    if not args.dry_run:
+    import prompter
+
+    rename_plan = rename.plan(struct.Outline(args.path))
+    for change in rename_plan.changes:
+        print("----" + change.old)
+        print("++++" + change.new)
+    if not args.dry_run and rename_plan.changes:
         if prompter.yesno("Rename these files?"):
-            outline.auto_rename(args.dry_run)
+            try:
+                rename.apply(rename_plan)
+            except rename.RenameError as exc:
+                print(exc)
+                return
             print("Files renamed.")
 
 
 def show_transform(args):
-    novel = struct.Novel(args.path)
-    outline = novel.outline
+    names = []
     if args.softcrlf:
         print("Transforming novel to soft crlf format.")
-        outline.transform_soft_crlf()
+        names.append("soft-crlf")
     if args.hardcrlf:
         print("Transforming novel to hard crlf format.")
-        outline.transform_hard_crlf()
+        names.append("hard-crlf")
+    names += getattr(args, "transforms", [])
+    dry_run = getattr(args, "dry_run", False)
+    if not names:
+        return
+
+    outline = struct.get_novel(args.path).load()
+    try:
+        results = transform.run(outline, names, dry_run, getattr(args, "jobs", None))
+    except ValueError as exc:
+        print(exc)
+        return
+    for result in results:
+        counts = ", ".join(f"{name}={count}" for name, count in result.counts.items())
+        if dry_run and any(result.counts.values()):
+            print(f"would change {result.path}: {counts}")
+        elif result.written:
+            print(f"changed {result.path}: {counts}")
 
 
 def show_compile(args):
@@ -162,20 +285,59 @@ def show_compile(args):
     else:
         build_dir = args.build_dir
 
-    if not os.path.exists(build_dir):
-        os.makedirs(build_dir)
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    try:
+        up_to_date, results = book.compile.build(
+            struct.get_novel(args.path), build_dir, formats, jobs=args.jobs
+        )
+    except ValueError as exc:
+        print(exc)
+        sys.exit(1)
+    for target in up_to_date:
+        print(f"{target} is up to date.")
+    for result in results:
+        status = "ok" if result.returncode == 0 else f"FAILED (exit {result.returncode})"
+        print(
+            f"{result.format}: {status} in {result.seconds:.1f}s -> {result.target} "
+            f"(log: {result.log_path})"
+        )
+    if any(result.returncode != 0 for result in results):
+        sys.exit(1)
 
-    novel = struct.Novel(args.path)
-    single_string = novel.compile()
 
-    # write master md file
-    md_filename = os.path.join(build_dir, "single_file.md")
-    with open(md_filename, "w") as fp:
-        fp.write(single_string)
+def show_library(args):
+    import book.library as library
 
-    # convert md file to epub
-    epub_filename = os.path.join(build_dir, "book.epub")
-    book.compile.compile_to_epub(md_filename, epub_filename)
+    paths = library.discover(args.path)
+    options = {
+        "formats": [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()],
+        "transforms": args.transforms,
+        "dry_run": args.dry_run,
+    }
+    try:
+        results = library.run(paths, args.run, options, jobs=args.jobs)
+    except ValueError as exc:
+        print(exc)
+        sys.exit(1)
+    summary = library.totals(results)
+
+    if args.format == "json":
+        print(
+            json.dumps(
+                {"totals": summary, "novels": [result._asdict() for result in results]},
+                indent=2,
+            )
+        )
+    else:
+        for result in results:
+            if result.ok:
+                values = ", ".join(f"{key}={value}" for key, value in result.result.items())
+                print(f"{result.path}: {values} ({result.seconds:.1f}s)")
+            else:
+                print(f"{result.path}: FAILED {result.error}")
+        print(", ".join(f"{key} = {value}" for key, value in sorted(summary.items())))
+    if summary["failed"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -4,14 +4,16 @@ argparse definitions.
 
 import argparse
 import logging
-import sys
 
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 COMPILE = "compile"
+COUNT = "count"
+FIND = "find"
+LIBRARY = "library"
 NEW = "new"
 RENAME = "rename"
+SERVE = "serve"
 SESSION = "session"
 STATS = "stats"
 TRANSFORM = "transform"
@@ -42,6 +44,12 @@ def get_stats_parser(sub_parsers):
         action="store_true",
         help="Show stats for folders instead of scenes.",
     )
+    parser.add_argument(
+        "--format",
+        default="text",
+        choices=("text", "csv", "json"),
+        help="Output format.  csv and json list every folder (with subtotals) and scene.",
+    )
     return parser
 
 
@@ -75,6 +83,30 @@ def get_transform_parser(sub_parsers):
         action="store_true",
         help="Remove whitespace between paragraphs.",
     )
+    parser.add_argument(
+        "--transform",
+        "-t",
+        dest="transforms",
+        metavar="NAME",
+        action="append",
+        default=[],
+        help="Transform to apply, may be repeated.  Applied in the order given: soft-crlf, "
+        "hard-crlf, trailing-whitespace, em-dashes, smart-quotes.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        "-n",
+        default=False,
+        action="store_true",
+        help="Only report how many changes each file would get.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of files to transform at once.",
+    )
     return parser
 
 
@@ -102,11 +134,88 @@ def get_new_parser(sub_parsers):
     return parser
 
 
+def get_find_parser(sub_parsers):
+    parser = sub_parsers.add_parser(FIND, help="Find the file of a folder or scene by ID.")
+    parser.add_argument("ID", type=int, help="ID from the metadata header.")
+    return parser
+
+
+def get_library_parser(sub_parsers):
+    parser = sub_parsers.add_parser(
+        LIBRARY, help="Run stats, compile or transform on every novel below PATH."
+    )
+    parser.add_argument(
+        "--run",
+        default="stats",
+        choices=("stats", "compile", "transform"),
+        help="Command to run on each novel.",
+    )
+    parser.add_argument(
+        "--format", default="text", choices=("text", "json"), help="Output format."
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of novels to process at once.",
+    )
+    parser.add_argument(
+        "--formats",
+        "-f",
+        default="epub",
+        help="compile: comma separated output formats: epub, html, docx, odt.",
+    )
+    parser.add_argument(
+        "--transform",
+        "-t",
+        dest="transforms",
+        metavar="NAME",
+        action="append",
+        default=[],
+        help="transform: transform to apply, may be repeated.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        "-n",
+        default=False,
+        action="store_true",
+        help="transform: only count the changes.",
+    )
+    return parser
+
+
+def get_serve_parser(sub_parsers):
+    parser = sub_parsers.add_parser(
+        SERVE,
+        help="Keep the novel loaded and answer stats, find, count and new from memory.",
+    )
+    return parser
+
+
+def get_count_parser(sub_parsers):
+    parser = sub_parsers.add_parser(COUNT, help="Print the word count of the novel.")
+    return parser
+
+
 def get_compile_parser(sub_parsers):
     parser = sub_parsers.add_parser(COMPILE, help="Compile the novel ")
     parser.add_argument(
         '--build-dir', '-b', default=None, help='directory to use to build the novel.'
     )
+    parser.add_argument(
+        "--formats",
+        "-f",
+        default="epub",
+        help="Comma separated output formats: epub, html, docx, odt.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=None,
+        help="Maximum number of pandoc processes to run at once.",
+    )
     return parser
 
 
@@ -118,6 +227,37 @@ def get_parser():
     parser.add_argument(
         "path", metavar="PATH", type=str, help="Path to book directory."
     )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        default=False,
+        action="store_true",
+        help="Show debug logging.",
+    )
+    parser.add_argument(
+        "--no-serve",
+        default=False,
+        action="store_true",
+        help="Don't ask a running `book serve` daemon, always read the novel.",
+    )
+    parser.add_argument(
+        "--profile",
+        default=False,
+        action="store_true",
+        help="Print I/O counters and timers when the command exits (also set by BOOK_PROFILE).",
+    )
+    parser.add_argument(
+        "--profile-out",
+        metavar="FILE",
+        default=None,
+        help="Append the --profile summary to FILE instead of printing it.",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        default=None,
+        help="Dump cProfile stats of the whole command to FILE.",
+    )
 
     get_new_parser(sub_parsers)
     get_rename_parser(sub_parsers)
@@ -126,5 +266,9 @@ def get_parser():
     get_transform_parser(sub_parsers)
     get_work_parser(sub_parsers)
     get_compile_parser(sub_parsers)
+    get_find_parser(sub_parsers)
+    get_library_parser(sub_parsers)
+    get_serve_parser(sub_parsers)
+    get_count_parser(sub_parsers)
 
     return parser
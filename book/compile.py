@@ -1,34 +1,319 @@
+"""
+Turning the novel into a book: the streaming markdown pipeline and the pandoc conversion.
+
+The markdown is produced as a stream of fragments (frontmatter, then every node's heading and
+body), runs of blank lines are normalized in a single pass over that stream and the result goes
+straight to the file, so the whole manuscript is never held in memory.
+
+`BuildCache` makes the build incremental: cleaned fragments are kept under the build directory, a
+build whose fragments didn't change doesn't rewrite `single_file.md`, and pandoc is skipped when
+the markdown is the same as in the previous build.
+
+Every output format gets its own pandoc process, run side by side from one `single_file.md`.
+"""
+
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
 import subprocess
+import time
+
+import book.fs_utils as fs_utils
+import book.manifest as manifest
+import book.profiling as profiling
+
+logger = logging.getLogger(__name__)
+
+NEWLINE_RUN = re.compile(r"\n{3,}")
+
+EPUB = "epub"
+HTML = "html"
+DOCX = "docx"
+ODT = "odt"
+FORMAT_OPTIONS = {
+    EPUB: ["--epub-chapter-level", "2"],
+    HTML: ["--standalone"],
+    DOCX: [],
+    ODT: [],
+}
+
+CompileResult = collections.namedtuple(
+    "CompileResult", ["format", "target", "returncode", "seconds", "log_path"]
+)
+
+
+def normalize_newlines(fragments):
+    """
+    Collapse every run of three or more newlines to two, also across fragment boundaries.
+
+    Same result as replacing "\\n\\n\\n" until none are left, but in one pass.
+    """
+    pending = 0  # Newlines at the end of the stream so far, not written yet.
+    for fragment in fragments:
+        text = fragment.lstrip("\n")
+        pending += len(fragment) - len(text)
+        if not text:
+            continue
+        body = text.rstrip("\n")
+        yield "\n" * min(pending, 2) + NEWLINE_RUN.sub("\n\n", body)
+        pending = len(text) - len(body)
+    if pending:
+        yield "\n" * min(pending, 2)
+
+
+def write_markdown(path, fragments):
+    """
+    Normalize `fragments` and write them to `path` as they are produced.
+    """
+    with open(path, "w") as fp:
+        for text in normalize_newlines(fragments):
+            fp.write(text)
+
+
+def clean_fragment(fragment):
+    return "".join(normalize_newlines([fragment]))
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
+
+
+class BuildCache(object):
+    """
+    Per-node compile fragments and build state, kept in `.cache/` in the build directory.
+
+    Fragments are stored by the hash of their content.  The state maps each source file to the
+    hash of its fragment, valid while the file's (mtime_ns, size, inode) is unchanged, and
+    records the markdown hash each output was last built from.
+    """
+
+    DIRNAME = ".cache"
+    STATE_FILENAME = "state.json"
+    VERSION = 1
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.path = os.path.join(build_dir, self.DIRNAME)
+        self.state = self.load()
+
+    @property
+    def state_path(self):
+        return os.path.join(self.path, self.STATE_FILENAME)
+
+    def load(self):
+        try:
+            with open(self.state_path, "r") as fp:
+                state = json.load(fp)
+            if state.get("version") == self.VERSION:
+                return state
+        except (IOError, ValueError):
+            pass
+        return {"version": self.VERSION, "sources": {}, "targets": {}}
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        fs_utils.write_atomic(self.state_path, json.dumps(self.state))
+
+    def fragment_path(self, fragment_hash):
+        return os.path.join(self.path, f"{fragment_hash}.md")
+
+    def fragment_hash(self, node):
+        """
+        Hash of the cleaned fragment of `node`, compiling and storing it only if the node's file
+        changed since the last build.
+        """
+        try:
+            profiling.count("stat")
+            key = manifest.stat_key(os.stat(node.file_path))
+        except FileNotFoundError:
+            key = None
+        source = self.state["sources"].get(node.file_path)
+        if (
+            key is not None
+            and source is not None
+            and source["stat"] == key
+            and os.path.exists(self.fragment_path(source["hash"]))
+        ):
+            return source["hash"]
+
+        fragment = clean_fragment(node.fragment())
+        fragment_hash = content_hash(fragment)
+        fragment_path = self.fragment_path(fragment_hash)
+        if not os.path.exists(fragment_path):
+            os.makedirs(self.path, exist_ok=True)
+            with open(fragment_path, "w") as fp:
+                fp.write(fragment)
+        if key is not None:
+            self.state["sources"][node.file_path] = {"stat": key, "hash": fragment_hash}
+        return fragment_hash
+
+    def iter_fragments(self, hashes):
+        for fragment_hash in hashes:
+            with open(self.fragment_path(fragment_hash), "r") as fp:
+                fragment = fp.read()
+            profiling.count("read")
+            profiling.count("read_bytes", len(fragment))
+            yield fragment
+
+    def build_markdown(self, md_filename, frontmatter, nodes, backmatter):
+        """
+        Write `md_filename` from the fragments of `nodes` and return the hash of its content.
+
+        When no fragment changed since the last build the file is left alone.
+        """
+        nodes = list(nodes)
+        hashes = [self.fragment_hash(node) for node in nodes]
+        sources = self.state["sources"]
+        self.state["sources"] = {
+            node.file_path: sources[node.file_path]
+            for node in nodes
+            if node.file_path in sources
+        }
+        build_key = content_hash("\n".join([frontmatter, backmatter] + hashes))
+        if (
+            build_key == self.state.get("build_key")
+            and os.path.exists(md_filename)
+            and self.state.get("md_hash")
+        ):
+            logger.info(f"{md_filename} is up to date")
+            return self.state["md_hash"]
+
+        fragments = itertools.chain([frontmatter], self.iter_fragments(hashes), [backmatter])
+        digest = hashlib.sha256()
+        with open(md_filename, "w") as fp:
+            for text in normalize_newlines(fragments):
+                digest.update(text.encode("utf8"))
+                fp.write(text)
+        self.state["build_key"] = build_key
+        self.state["md_hash"] = digest.hexdigest()
+        self.prune(hashes)
+        return self.state["md_hash"]
+
+    def prune(self, hashes):
+        """
+        Remove the fragment files the current build doesn't use.
+        """
+        keep = {f"{fragment_hash}.md" for fragment_hash in hashes}
+        if not os.path.exists(self.path):
+            return
+        for filename in os.listdir(self.path):
+            if filename.endswith(".md") and filename not in keep:
+                os.remove(os.path.join(self.path, filename))
+
+    def is_current(self, target, md_hash):
+        """
+        True if `target` exists and was built from markdown with hash `md_hash`.
+        """
+        return self.state["targets"].get(target) == md_hash and os.path.exists(target)
+
+    def record(self, target, md_hash):
+        self.state["targets"][target] = md_hash
+
+
+def pandoc_command(src_md, dst, fmt):
+    """
+    pandoc -o dst src_md --toc --toc-depth=2 --number-sections --smart --verbose plus the
+    options of the output format, e.g. --epub-chapter-level=2 for epub.
+    """
+    cmd = ["pandoc", "-o", dst, src_md, "--toc", "--toc-depth", "2"]
+    cmd += FORMAT_OPTIONS[fmt]
+    cmd += ["--number-sections", "--smart", "--verbose"]
+    return cmd
+
+
+def run_pandoc(src_md, dst, fmt):
+    """
+    Convert `src_md` to `dst` in format `fmt` and return a `CompileResult`.
+
+    pandoc's output goes to `dst` + ".log" instead of being buffered in memory.
+    """
+    log_path = f"{dst}.log"
+    start = time.perf_counter()
+    with open(log_path, "w") as log, profiling.timer("pandoc"):
+        try:
+            returncode = subprocess.call(
+                pandoc_command(src_md, dst, fmt), stdout=log, stderr=subprocess.STDOUT
+            )
+        except FileNotFoundError:
+            log.write("pandoc not found\n")
+            returncode = 127
+    return CompileResult(fmt, dst, returncode, time.perf_counter() - start, log_path)
+
+
+def compile_formats(src_md, targets, jobs=None):
+    """
+    Run one pandoc per `{format: dst}` in `targets` concurrently, at most `jobs` at a time.
+
+    All of them read the same `src_md`.  Returns a `CompileResult` per target in the order given.
+    """
+    unknown = set(targets) - set(FORMAT_OPTIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown format(s) {', '.join(sorted(unknown))}, use {', '.join(FORMAT_OPTIONS)}"
+        )
+    if not targets:
+        return []
+    if jobs is None:
+        jobs = min(len(targets), os.cpu_count() or 1)
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(run_pandoc, src_md, dst, fmt) for fmt, dst in targets.items()
+        ]
+        return [future.result() for future in futures]
+
+
+def build(novel, build_dir, formats, jobs=None):
+    """
+    Incrementally compile `novel` into `build_dir`.
+
+    `single_file.md` is written from the cached fragments, then pandoc runs for every format in
+    `formats` whose `book.<format>` isn't already built from that markdown.  Returns the list of
+    targets that were up to date and a `CompileResult` per pandoc run.  Unknown formats raise
+    ValueError before pandoc is started.
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    cache = BuildCache(build_dir)
+
+    # write master md file from the cached fragments
+    md_filename = os.path.join(build_dir, "single_file.md")
+    md_hash = cache.build_markdown(
+        md_filename,
+        novel.compile_frontmatter(),
+        novel.snapshot().walk(),
+        novel.compile_backmatter(),
+    )
+
+    # convert md file to every requested format, side by side
+    up_to_date = []
+    targets = {}
+    for fmt in formats:
+        target = os.path.join(build_dir, f"book.{fmt}")
+        if cache.is_current(target, md_hash):
+            up_to_date.append(target)
+        else:
+            targets[fmt] = target
+
+    results = compile_formats(md_filename, targets, jobs=jobs)
+    for result in results:
+        if result.returncode == 0:
+            cache.record(result.target, md_hash)
+    cache.save()
+    return up_to_date, results
 
 
 def compile_to_epub(src_md, dst_epub):
     """
     src_md and dst_epub are all paths.
 
-    Runs an appropriate pandoc command to create and epub file at the location specified by 
-    dst_epub.
-
-    pandoc -o dst_epub metadata.yaml src_md -t epub3
-    --toc --toc-depth=2 --epub-stylesheet=... --epub-chapter-level=2 --number-sections
-    --smart
-    --css
-    """
-    print(f'compiling {src_md} to {dst_epub}')
-    cmd = [
-        'pandoc',
-        '-o',
-        dst_epub,
-        src_md,
-        '--toc',
-        '--toc-depth',
-        '2',
-        '--epub-chapter-level',
-        '2',
-        '--number-sections',
-        '--smart',
-        '--verbose',
-    ]
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = proc.communicate()
-    print(stdout)
-    print(stderr)
+    Runs an appropriate pandoc command to create and epub file at the location specified by
+    dst_epub.  Returns pandoc's exit code.
+    """
+    print(f"compiling {src_md} to {dst_epub}")
+    result = run_pandoc(src_md, dst_epub, EPUB)
+    return result.returncode
@@ -1,11 +1,9 @@
 import os.path
 
-import yaml
-
 
 class Config(object):
 
-    DEFAULT_KEYS = ("tiddlywiki",)
+    DEFAULT_KEYS = ("tiddlywiki", "wordcount", "hyphens")
 
     def __init__(self, path=None):
         if path is None:
@@ -16,11 +14,17 @@ class Config(object):
 
         try:
             with open(path, "r") as fp:
-                self._conf = yaml.safe_load(fp.read())
-                for key in self._conf:
-                    setattr(self, key, self._conf[key])
+                content = fp.read()
         except IOError:
             self._conf = {}
+            return
+
+        # Only novels that have a config.yaml pay for importing yaml.
+        import yaml
+
+        self._conf = yaml.safe_load(content) or {}
+        for key in self._conf:
+            setattr(self, key, self._conf[key])
 
 
 def get_config(path):
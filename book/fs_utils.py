@@ -5,8 +5,9 @@ or to gather data needed to instantiate those object.
 """
 
 import os.path
+import threading
 
-
+import book.profiling as profiling
 import book.structure as struct
 
 
@@ -16,16 +17,17 @@ def find_novel_in_path(path):
     Return the directory containing novel.md or None if no parent directory
     contains novel.md
     """
-    curr_path = path
-    while curr_path and curr_path != "/":
-        # print(curr_path)
-        try:
-            if is_path_a_novel(curr_path):
-                return curr_path
-        except FileNotFoundError:
-            pass
-        curr_path, _ = os.path.split(curr_path)
-    return None
+    with profiling.timer("find_novel"):
+        curr_path = path
+        while curr_path and curr_path != "/":
+            # print(curr_path)
+            try:
+                if is_path_a_novel(curr_path):
+                    return curr_path
+            except FileNotFoundError:
+                pass
+            curr_path, _ = os.path.split(curr_path)
+        return None
 
 
 def is_path_a_novel(path):
@@ -34,6 +36,7 @@ def is_path_a_novel(path):
     if not os.path.isdir(path):
         return False
     # print(os.listdir(path))
+    profiling.count("listdir")
     return struct.Novel.ANCHOR in os.listdir(path)
 
 
@@ -59,3 +62,21 @@ def title_from_path(path):
         return os.path.splitext(filename.split("-")[1])[0]
     except IndexError:
         return None
+
+
+def write_atomic(path, text):
+    """
+    Write `text` to `path` through a temporary file and `os.replace`, so a concurrent reader
+    sees either the old or the new content, never a partial file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf8") as fp:
+            fp.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -4,14 +4,21 @@ Utilities for interacting with git.
 
 
 import datetime
+import os
+import threading
+import time
 from dateutil import tz
 import logging
 
 import git
 
+import book.profiling as profiling
+
 Repo = git.Repo
 # from git import Repo
 
+logger = logging.getLogger(__name__)
+
 git_logger = logging.getLogger("git.cmd")
 git_logger.setLevel(logging.INFO)
 
@@ -29,15 +36,46 @@ def get_repo(path, silent=False):
         return None
 
 
-def is_dirty(path):
+def pathspec(paths):
+    """
+    Map `paths` to the nearest existing path each, so deleted files are still covered by a
+    pathspec through their parent directory.  Paths inside another path of the result are
+    dropped.  Returns a sorted list.
+    """
+    spec = set()
+    for path in paths:
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        spec.add(path)
+    result = []
+    for path in sorted(spec):
+        if result and path.startswith(os.path.join(result[-1], "")):
+            continue
+        result.append(path)
+    return result
+
+
+def is_dirty(path, repo=None, paths=None):
     """
     Returns True if there are untracked files or changed files in the repo.
+
+    `repo` reuses an already opened handle.  When `paths` is given the check is a single
+    `git status --porcelain` limited to those paths instead of a scan of the whole worktree.
     """
-    repo = get_repo(path)
+    if repo is None:
+        repo = get_repo(path)
+    if repo and paths is not None:
+        spec = pathspec(paths)
+        if not spec:
+            return False
+        with profiling.timer("git"):
+            return bool(repo.git.status("--porcelain", "--", *spec))
     if repo:
-        if repo.untracked_files:
-            return True
-        changed_files = [item.a_path for item in repo.index.diff(None)]
+        with profiling.timer("git"):
+            if repo.untracked_files:
+                return True
+            changed_files = [item.a_path for item in repo.index.diff(None)]
         if changed_files:
             return True
         return False
@@ -45,20 +83,131 @@ def is_dirty(path):
         return False
 
 
-def commit(path):
+def commit(path, repo=None, push=True, paths=None):
     """
     Add and commit untracked files and changed files.  Message is the date/time in iso format.
+
+    Everything is staged with a single `git add -A`, limited to `paths` when given.  With `push`
+    False the commit stays local; see `PushWorker` for pushing in the background.
     """
-    repo = get_repo(path)
+    if repo is None:
+        repo = get_repo(path)
     if repo:
-        for item in repo.untracked_files:
-            repo.git.add(item)
-        repo.git.commit("-a", "-m", f"{aware_datetime().isoformat()}")
-        try:
-            repo.git.push()
-        except git.exc.GitCommandError as exc:
-            print("ERROR: Could not commit")
-            print(exc)
+        spec = []
+        if paths is not None:
+            spec = pathspec(paths)
+            if not spec:
+                return
+        with profiling.timer("git"):
+            repo.git.add("-A", "--", *spec)
+            repo.git.commit("-m", f"{aware_datetime().isoformat()}")
+        if push:
+            try:
+                with profiling.timer("git"):
+                    repo.git.push()
+            except git.exc.GitCommandError as exc:
+                print("ERROR: Could not commit")
+                print(exc)
+
+
+class PushWorker(threading.Thread):
+    """
+    Pushes the repo at `path` from a background thread so a slow or offline remote never blocks
+    the caller.
+
+    `request()` queues a push and returns at once.  Requests that pile up while a push is
+    waiting or running are coalesced, since a single push sends every commit made so far.  A
+    failed push is retried after a delay that doubles with each failure, up to `MAX_BACKOFF`.
+    """
+
+    INITIAL_BACKOFF = 5
+    MAX_BACKOFF = 600
+
+    def __init__(self, path):
+        super().__init__(name="book-push", daemon=True)
+        self.path = path
+        self.pending = 0  # commits not pushed yet
+        self.failures = 0
+        self.last_error = None
+        self.last_push = None
+        self.retry_at = None
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def request(self):
+        """
+        Queue a push of the commits made so far.
+        """
+        with self._cond:
+            self.pending += 1
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until nothing is pending.  Returns False if `timeout` ran out first.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.pending, timeout)
+
+    def stop(self, timeout=None):
+        """
+        Stop the worker.  A push that is already running is allowed to finish; retries waiting
+        out their backoff are dropped.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+
+    @property
+    def backoff(self):
+        if not self.failures:
+            return 0
+        return min(self.INITIAL_BACKOFF * 2 ** (self.failures - 1), self.MAX_BACKOFF)
+
+    @property
+    def status(self):
+        """
+        Short description of the push state for the session line.
+        """
+        with self._cond:
+            if self.failures:
+                retry = max(0, int(self.retry_at - time.time()))
+                return f"push failed, retry in {retry}s ({self.pending} pending)"
+            if self.pending:
+                return f"pushing ({self.pending} pending)"
+            if self.last_push is not None:
+                return "pushed"
+            return ""
+
+    def run(self):
+        repo = Repo(self.path)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.pending or self._stopped)
+                if not self.pending:
+                    return
+                count = self.pending
+            try:
+                with profiling.timer("git"):
+                    repo.git.push()
+            except git.exc.GitCommandError as exc:
+                with self._cond:
+                    self.failures += 1
+                    self.last_error = exc
+                    self.retry_at = time.time() + self.backoff
+                    logger.warning("push failed (%d): %s", self.failures, exc)
+                    if self._cond.wait_for(lambda: self._stopped, self.backoff):
+                        return
+                continue
+            with self._cond:
+                self.pending -= count
+                self.failures = 0
+                self.last_error = None
+                self.retry_at = None
+                self.last_push = time.time()
+                self._cond.notify_all()
 
 
 def aware_datetime():
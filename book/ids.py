@@ -0,0 +1,94 @@
+"""
+Hands out scene and folder IDs without reading every header in the novel.
+
+The highest ID handed out so far is kept in `.book/ids`; the next ID is one above it or above the
+highest ID in the manifest, whichever is larger.  The manifest is only used after a stat walk of
+the outline shows every entry still matches its file, so scenes added or changed behind its back
+(a git pull, an edit by hand) are never missed.  When that check fails the IDs are recovered with
+a load of the outline, which re-reads only the files that changed.  A lock file serializes
+concurrent `book new` invocations where `fcntl` is available.
+"""
+
+import contextlib
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX, allocations are not locked.
+    fcntl = None
+
+import book.fs_utils as fs_utils
+import book.manifest as manifest
+
+
+class IdAllocator(object):
+    FILENAME = "ids"
+    LOCK_FILENAME = "ids.lock"
+
+    def __init__(self, novel):
+        self.novel = novel
+
+    @property
+    def path(self):
+        return os.path.join(str(self.novel.path), manifest.BOOK_DIR, self.FILENAME)
+
+    @property
+    def lock_path(self):
+        return os.path.join(str(self.novel.path), manifest.BOOK_DIR, self.LOCK_FILENAME)
+
+    @contextlib.contextmanager
+    def lock(self):
+        manifest.get_book_dir(self.novel.path)
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "w") as fp:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp, fcntl.LOCK_UN)
+
+    def allocate(self):
+        """
+        Return the next free ID and record it as used.
+        """
+        with self.lock():
+            current = self.manifest_high()
+            if current is None:
+                current = self.scan()
+            high = max(self.read_high() or 0, current) + 1
+            self.write_high(high)
+        return high
+
+    def read_high(self):
+        try:
+            with open(self.path, "r") as fp:
+                return int(json.load(fp)["high"])
+        except (IOError, ValueError, KeyError, TypeError):
+            return None
+
+    def write_high(self, high):
+        fs_utils.write_atomic(self.path, json.dumps({"high": high}))
+
+    def manifest_high(self):
+        """
+        Highest ID in the outline according to the manifest, or None if any file in the outline
+        has no entry or changed since its entry was made.  Stats the files, reads none of them.
+        """
+        high = 0
+        for path, stat in self.novel.outline.walk_stats():
+            entry = self.novel.manifest.get(path, stat)
+            if entry is None:
+                return None
+            high = max(high, entry.get("ID") or 0)
+        self.novel.manifest.prune()
+        self.novel.manifest.save()
+        return high
+
+    def scan(self):
+        """
+        Load the outline for the highest ID, used when the manifest can't be trusted.
+        """
+        return self.novel.load().max_pk
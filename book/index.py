@@ -0,0 +1,45 @@
+"""
+ID -> path index of the outline, built along with the tree load or from the manifest.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdIndex(object):
+    """
+    Maps the `ID` in each node's metadata to the file it came from.
+
+    Duplicate IDs are reported as they are found, the first path seen keeps the ID.
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self.duplicates = {}  # ID -> every path claiming it
+
+    def add(self, pk, path):
+        if not pk:
+            # No ID (or the default of 0), nothing to index.
+            return
+        existing = self._paths.get(pk)
+        if existing is None:
+            self._paths[pk] = path
+        elif existing != path:
+            self.duplicates.setdefault(pk, [existing]).append(path)
+            logger.warning(f"Duplicate ID {pk}: {existing} and {path}")
+
+    def lookup(self, pk):
+        """
+        Path of the node with ID `pk` or None.
+        """
+        try:
+            return self._paths.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def __contains__(self, pk):
+        return self.lookup(pk) is not None
+
+    def __len__(self):
+        return len(self._paths)
@@ -0,0 +1,152 @@
+"""
+Library mode: run a command over every novel below a root directory.
+
+Novels are found by their `MANUSKRIPT` anchor and handed out to a process pool, so the library
+is processed in parallel from a single `book` invocation.  An exception while handling a novel
+only fails that novel; the others carry on.  Anything a command prints goes to stderr, stdout
+is left to the report (which may be JSON).
+"""
+import collections
+import concurrent.futures
+import contextlib
+import os
+import sys
+import time
+import traceback
+
+import book.compile as compiler
+import book.stats as stats
+import book.structure as struct
+import book.transform as transform
+
+STATS = "stats"
+COMPILE = "compile"
+TRANSFORM = "transform"
+
+NovelResult = collections.namedtuple(
+    "NovelResult", ["path", "ok", "result", "error", "seconds"]
+)
+
+
+def discover(root):
+    """
+    Sorted paths of every novel below `root` (including `root` itself).
+
+    Hidden directories are skipped and nothing below a novel is searched, novels don't nest.
+    """
+    novels = []
+    pending = [os.path.abspath(root)]
+    while pending:
+        path = pending.pop()
+        try:
+            with os.scandir(path) as entries:
+                entries = list(entries)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        if any(entry.name == struct.Novel.ANCHOR for entry in entries):
+            novels.append(path)
+            continue
+        pending.extend(
+            entry.path
+            for entry in entries
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+        )
+    return sorted(novels)
+
+
+def run_stats(path, options):
+    root = struct.get_novel(path).snapshot()
+    return stats.totals(root)
+
+
+def run_compile(path, options):
+    build_dir = os.path.join(path, "build")
+    up_to_date, results = compiler.build(
+        struct.get_novel(path), build_dir, options.get("formats", []), jobs=1
+    )
+    failed = [result for result in results if result.returncode != 0]
+    if failed:
+        raise RuntimeError(
+            "; ".join(
+                f"{result.format} failed (exit {result.returncode}, log: {result.log_path})"
+                for result in failed
+            )
+        )
+    return {
+        "up_to_date": up_to_date,
+        "built": [result.target for result in results],
+    }
+
+
+def run_transform(path, options):
+    dry_run = options.get("dry_run", False)
+    outline = struct.get_novel(path).load()
+    results = transform.run(outline, options.get("transforms", []), dry_run, jobs=1)
+    counts = collections.Counter()
+    files = 0
+    for result in results:
+        counts.update(result.counts)
+        if result.written or (dry_run and any(result.counts.values())):
+            files += 1
+    return {"files": files, "counts": dict(counts)}
+
+
+COMMANDS = {
+    STATS: run_stats,
+    COMPILE: run_compile,
+    TRANSFORM: run_transform,
+}
+
+
+def run_one(command, path, options):
+    """
+    Run `command` on the novel at `path` and wrap the outcome, or the exception, in a
+    `NovelResult`.
+    """
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = COMMANDS[command](path, options)
+    except Exception as exc:
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        return NovelResult(path, False, None, error, time.perf_counter() - start)
+    return NovelResult(path, True, result, None, time.perf_counter() - start)
+
+
+def run(paths, command, options=None, jobs=None):
+    """
+    Run `command` (stats, compile or transform) on every novel in `paths` on a pool of `jobs`
+    processes.  Returns a `NovelResult` per novel in the order of `paths`.
+    """
+    if command not in COMMANDS:
+        raise ValueError(f"Unknown library command {command!r}, use {', '.join(COMMANDS)}")
+    if options is None:
+        options = {}
+    if not paths:
+        return []
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_one, command, path, options) for path in paths]
+        for path, future in zip(paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as exc:
+                # The worker process died (BrokenProcessPool) or the result didn't pickle.
+                # Exceptions raised by the command itself are already caught in `run_one`.
+                results.append(NovelResult(path, False, None, repr(exc), 0.0))
+    return results
+
+
+def totals(results):
+    """
+    Aggregate stats results: novels, failures and the summed totals of the successful ones.
+    """
+    summary = collections.Counter()
+    for result in results:
+        if result.ok and isinstance(result.result, dict):
+            for key, value in result.result.items():
+                if key != "max_pk" and isinstance(value, int):
+                    summary[key] += value
+    summary["novels"] = len(results)
+    summary["failed"] = sum(1 for result in results if not result.ok)
+    return dict(summary)
@@ -0,0 +1,132 @@
+"""
+Persistent cache of the parsed scene data.
+
+The manifest lives in `.book/manifest` in the novel root.  It stores the parsed header, word count,
+byte size and ID of every outline file keyed by the path relative to the novel.  Each entry is only
+trusted while the (mtime_ns, size, inode) of the file still matches, so a command that loads the
+novel only has to re-read the files that changed since the last run.
+"""
+
+import json
+import logging
+import os
+
+import book.fs_utils as fs_utils
+
+logger = logging.getLogger(__name__)
+
+BOOK_DIR = ".book"
+
+
+def stat_key(stat):
+    """
+    The part of an `os.stat_result` that decides whether a cached entry is still valid.
+    """
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def get_book_dir(novel_path):
+    """
+    Return the `.book` directory of the novel, creating it if needed.
+
+    The directory only holds caches so it ignores itself for git.
+    """
+    book_dir = os.path.join(str(novel_path), BOOK_DIR)
+    if not os.path.exists(book_dir):
+        os.makedirs(book_dir, exist_ok=True)
+        with open(os.path.join(book_dir, ".gitignore"), "w") as fp:
+            fp.write("*\n")
+    return book_dir
+
+
+class Manifest(object):
+    """
+    Stat keyed cache of header, word count, byte size and ID for every file in the outline.
+    """
+
+    FILENAME = "manifest"
+    VERSION = 1
+
+    def __init__(self, novel_path, rules=None):
+        self.novel_path = str(novel_path)
+        self.rules = rules
+        self._entries = None
+        self._seen = set()
+        self._dirty = False
+
+    @property
+    def path(self):
+        return os.path.join(self.novel_path, BOOK_DIR, self.FILENAME)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self.load()
+        return self._entries
+
+    def load(self):
+        try:
+            with open(self.path, "r") as fp:
+                data = json.load(fp)
+            if data.get("version") != self.VERSION or data.get("rules") != self.rules:
+                # Word counts were made with other counting rules.
+                data = {}
+        except (IOError, ValueError):
+            data = {}
+        self._entries = data.get("entries", {})
+        self._seen = set()
+        self._dirty = False
+
+    def save(self):
+        """
+        Write the manifest if anything changed.  The write is atomic so a concurrent reader never
+        sees a partial file.
+        """
+        if not self._dirty:
+            return
+        get_book_dir(self.novel_path)
+        data = {"version": self.VERSION, "rules": self.rules, "entries": self.entries}
+        try:
+            fs_utils.write_atomic(self.path, json.dumps(data))
+        except IOError:
+            logger.warning(f"Could not write manifest {self.path}")
+            return
+        self._dirty = False
+
+    def relpath(self, path):
+        return os.path.relpath(str(path), self.novel_path)
+
+    def get(self, path, stat):
+        """
+        Return the entry for `path` or None if there is none or it no longer matches `stat`.
+        """
+        key = self.relpath(path)
+        entry = self.entries.get(key)  # loads the manifest first, which resets `_seen`
+        self._seen.add(key)
+        if entry is None or entry["stat"] != stat_key(stat):
+            return None
+        return entry
+
+    def update(self, path, stat, header, count, pk):
+        key = self.relpath(path)
+        entries = self.entries
+        self._seen.add(key)
+        entries[key] = {
+            "stat": stat_key(stat),
+            "header": header,
+            "count": count,
+            "bytes": stat.st_size,
+            "ID": pk,
+        }
+        self._dirty = True
+
+    def prune(self):
+        """
+        Drop the entries that were not looked at since the manifest was loaded or last pruned.
+
+        Only call this after a walk of the complete outline.
+        """
+        for key in set(self.entries) - self._seen:
+            del self.entries[key]
+            self._dirty = True
+        self._seen = set()
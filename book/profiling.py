@@ -0,0 +1,140 @@
+"""
+Counters and timers that show where a command spends its time.
+
+Everything is off until `start()` is called (`book --profile ...`, or `BOOK_PROFILE` for a
+session).  While off, `count()` is a single flag check and `timer()` returns a shared no-op
+context manager, so the hooks left in the hot paths cost next to nothing.
+
+Counter names used by the hooks:
+
+* `listdir`: directory listings (`os.scandir`, `os.listdir`)
+* `stat`: stat calls
+* `read`, `read_bytes`: files opened for reading and the bytes read from them
+* `parse`: header parsing
+* `find_novel`: walks up the path looking for the novel root
+* `git`: git commands
+* `pandoc`: pandoc runs
+"""
+import atexit
+import collections
+import contextlib
+import cProfile
+import sys
+import threading
+import time
+
+ENV_VAR = "BOOK_PROFILE"
+
+_enabled = False
+_lock = threading.Lock()
+_profiler = None
+_null_timer = contextlib.nullcontext()
+
+counters = collections.Counter()
+timers = collections.Counter()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def count(name, amount=1):
+    """
+    Add `amount` to the counter `name`.
+    """
+    if _enabled:
+        with _lock:
+            counters[name] += amount
+
+
+class _Timer(object):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            counters[self.name] += 1
+            timers[self.name] += elapsed
+        return False
+
+
+def timer(name):
+    """
+    Context manager that counts one `name` call and adds its duration to the timer `name`.
+    """
+    if _enabled:
+        return _Timer(name)
+    return _null_timer
+
+
+def reset():
+    with _lock:
+        counters.clear()
+        timers.clear()
+
+
+def start(out=None, cprofile_path=None):
+    """
+    Turn on the counters and print their summary to `out` (a path, default stderr) when the
+    process exits.  With `cprofile_path` the whole run is also profiled with cProfile and the
+    stats are dumped to that file for `pstats`/snakeviz.
+    """
+    global _profiler
+    enable()
+    if cprofile_path is not None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(stop, out, cprofile_path)
+
+
+def stop(out=None, cprofile_path=None):
+    """
+    Turn the counters off, write the summary and dump the cProfile stats if they were taken.
+    """
+    global _profiler
+    if not _enabled:
+        return
+    disable()
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(cprofile_path)
+        _profiler = None
+    if out is None:
+        print(summary(), file=sys.stderr)
+    else:
+        with open(out, "a") as fp:
+            fp.write(summary() + "\n")
+
+
+def summary():
+    """
+    Table of every counter, with total and mean time for the timed ones.
+    """
+    with _lock:
+        rows = sorted(counters.items())
+        totals = dict(timers)
+    lines = [f"{'profile':<12} {'count':>10} {'total ms':>10} {'mean ms':>10}"]
+    for name, value in rows:
+        if name in totals:
+            total = totals[name] * 1000
+            lines.append(f"{name:<12} {value:>10} {total:>10.1f} {total / value:>10.3f}")
+        else:
+            lines.append(f"{name:<12} {value:>10}")
+    return "\n".join(lines)
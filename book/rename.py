@@ -0,0 +1,109 @@
+"""
+Renaming folders and scenes after their order and title.
+
+The renames are planned once for the whole outline, shown to the user and then that exact plan is
+applied.  Applying moves every file of a directory to a temporary name first and then to its new
+name, so a new name that another file still holds is never a problem.  If a rename fails part way
+the ones already done are undone.
+"""
+
+import collections
+import os
+
+import book.structure as struct
+
+RenameOp = collections.namedtuple("RenameOp", ["old", "new"])
+
+TEMP_PREFIX = ".book-rename"
+
+
+class RenameError(Exception):
+    pass
+
+
+class RenamePlan(object):
+    """
+    Every (old, new) path pair of the outline, including the ones that don't change.
+    """
+
+    def __init__(self, ops):
+        self.ops = ops
+
+    @property
+    def changes(self):
+        return [op for op in self.ops if op.old != op.new]
+
+    def __iter__(self):
+        return iter(self.ops)
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def plan(outline):
+    """
+    Work out the new path of every folder and scene below `outline`.  Nothing is renamed.
+    """
+    outline.load_tree()
+    return RenamePlan(list(_plan_dir(outline)))
+
+
+def _plan_dir(node):
+    children = node.children
+    digits = len(str(len(children)))
+    moving = {os.path.basename(child.path) for child in children}
+    with os.scandir(node.folder_path) as entries:
+        # Entries that stay put and so can't be renamed onto.
+        occupied = {entry.name for entry in entries} - moving
+
+    local_ops = []
+    for idx, child in enumerate(children):
+        ext = ".md" if isinstance(child, struct.Scene) else ""
+        new_filename = f"{idx:0{digits}}-{child.safe_title}{ext}"
+        if new_filename in occupied:
+            new_filename = f"{idx:0{digits}}-{child.safe_title}-{child.pk}{ext}"
+        local_ops.append(RenameOp(child.path, os.path.join(node.folder_path, new_filename)))
+
+    yield from local_ops
+    for folder in node.folders():
+        yield from _plan_dir(folder)
+
+
+def apply(rename_plan):
+    """
+    Carry out `rename_plan`.  On failure everything renamed so far is put back and a
+    `RenameError` is raised.
+    """
+    groups = collections.OrderedDict()
+    for op in rename_plan.changes:
+        groups.setdefault(os.path.dirname(op.old), []).append(op)
+    # Deepest directories first, so the paths inside a folder are still valid until the folder
+    # itself is renamed.
+    directories = sorted(groups, key=lambda path: path.count(os.sep), reverse=True)
+
+    done = []
+    try:
+        for directory in directories:
+            temps = []
+            for idx, op in enumerate(groups[directory]):
+                temp = os.path.join(directory, f"{TEMP_PREFIX}-{os.getpid()}-{idx}")
+                _rename(op.old, temp, done)
+                temps.append(temp)
+            for temp, op in zip(temps, groups[directory]):
+                if os.path.exists(op.new):
+                    raise FileExistsError(f"{op.new} already exists")
+                print(f"renaming {op.old} --> {op.new}")
+                _rename(temp, op.new, done)
+    except OSError as exc:
+        rollback(done)
+        raise RenameError(f"Rename failed, nothing was renamed: {exc}") from exc
+
+
+def _rename(src, dst, done):
+    os.rename(src, dst)
+    done.append((src, dst))
+
+
+def rollback(done):
+    for src, dst in reversed(done):
+        os.rename(dst, src)
@@ -0,0 +1,232 @@
+"""
+`book serve`: a daemon that keeps a novel loaded and answers queries over a Unix socket.
+
+The daemon holds a snapshot of the novel and its ID index in memory and refreshes them when the
+watcher reports a change to the outline, so `stats`, `find`, `count` and `new` are answered
+without walking the tree again.  The socket lives at `.book/serve.sock` in the novel.
+
+The protocol is one JSON object per line.  A request is `{"command": ..., "args": {...}}`, the
+reply is `{"ok": true, "result": ...}` or `{"ok": false, "error": "..."}`.
+
+`request()` is the client side.  It returns None when no daemon is listening, and the CLI then
+does the work itself.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+import book.fs_utils as fs_utils
+import book.manifest as manifest
+import book.stats as stats
+import book.structure as struct
+
+logger = logging.getLogger(__name__)
+
+SOCKET_FILENAME = "serve.sock"
+TIMEOUT = 5  # seconds a client waits for an answer
+
+
+class ServeError(Exception):
+    """
+    A request the daemon understood but could not carry out.  The message goes to the client.
+    """
+
+
+def socket_path(novel_path):
+    return os.path.join(str(novel_path), manifest.BOOK_DIR, SOCKET_FILENAME)
+
+
+def request(path, command, args=None, timeout=TIMEOUT):
+    """
+    Send `command` to the daemon serving the novel that contains `path`.
+
+    Returns the reply dict, or None if there is no daemon (no socket, or nobody listening).
+    Once the request has been sent the daemon may have acted on it, so a missing or broken
+    reply is an error reply rather than None, and the caller doesn't do the work a second time.
+    """
+    novel_path = fs_utils.find_novel_in_path(os.path.abspath(str(path)))
+    if novel_path is None:
+        return None
+    sock_path = socket_path(novel_path)
+    if not os.path.exists(sock_path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(sock_path)
+        except OSError as exc:
+            logger.info(f"no book daemon at {sock_path}: {exc}")
+            return None
+        try:
+            message = {"command": command, "args": args or {}}
+            sock.sendall(json.dumps(message).encode("utf8") + b"\n")
+            with sock.makefile("rb") as fp:
+                line = fp.readline()
+            reply = json.loads(line)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"bad reply from book daemon at {sock_path}: {exc}")
+            return {"ok": False, "error": f"No answer from the book daemon: {exc}"}
+    if not isinstance(reply, dict) or "ok" not in reply:
+        return {"ok": False, "error": f"Bad reply from the book daemon: {reply!r}"}
+    return reply
+
+
+class Server(object):
+    """
+    Serves the novel at `novel.path`.  Uses `watcher` to learn about changes; without one (or
+    with a polling watcher, which can't say when something changed) the novel is refreshed
+    before every request instead.
+    """
+
+    def __init__(self, novel, watcher=None):
+        self.novel = novel
+        self.watcher = watcher
+        self.live = watcher is not None and watcher.REPORTS_CHANGES
+        self.socket_path = socket_path(novel.path)
+        self.root = None
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._server = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Take a new snapshot (the manifest keeps this to a stat walk plus the changed files).
+        """
+        with self._lock:
+            self.root = self.novel.snapshot()
+
+    def catch_up(self):
+        """
+        Refresh if the watcher has changes queued.  Run before every answer, so a file saved
+        just before a request is always seen, however far the `run()` loop is behind.
+        """
+        with self._lock:
+            changes = self.watcher.poll()
+            if changes is None or changes:
+                self.refresh()
+
+    def handle(self, message):
+        """
+        Answer one request dict with a reply dict.
+        """
+        command = message.get("command")
+        fx = getattr(self, f"do_{command}", None) if isinstance(command, str) else None
+        if fx is None:
+            return {"ok": False, "error": f"Unknown command {command!r}"}
+        if self.live:
+            self.catch_up()
+        else:
+            self.refresh()
+        try:
+            return {"ok": True, "result": fx(**message.get("args", {}))}
+        except (ServeError, TypeError, ValueError) as exc:
+            return {"ok": False, "error": str(exc)}
+        except Exception as exc:
+            logger.exception(f"{command} failed")
+            return {"ok": False, "error": f"{command} failed: {exc}"}
+
+    def do_ping(self):
+        return {"pid": os.getpid(), "path": str(self.novel.path)}
+
+    def do_stats(self, format=stats.TEXT, folder=False):
+        out = io.StringIO()
+        stats.render(self.root, format, folders=folder, out=out)
+        return out.getvalue()
+
+    def do_count(self):
+        return self.root.count
+
+    def do_find(self, ID):
+        ID = int(ID)
+        with self._lock:
+            id_index = self.novel.index
+        return {
+            "path": id_index.lookup(ID),
+            "duplicates": id_index.duplicates.get(ID, [])[1:],
+        }
+
+    def do_new(self, path, convert=False):
+        """
+        Create the folder or scene `path` with a fresh ID, like `book new` inside a novel.
+        """
+        if os.path.exists(path) and not convert:
+            raise ServeError("Novel, folder or scene already exists.")
+        is_scene = os.path.splitext(path)[1] in (".md", ".txt")
+        kind = "scene" if is_scene else "folder"
+        if not fs_utils.has_order_digit(path):
+            raise ServeError(f"New {kind}s must have an order num (12-new_{kind})")
+        with self._lock:
+            node_class = struct.Scene if is_scene else struct.Folder
+            ID = self.novel.add_node(node_class, path, convert, fs_utils.title_from_path(path))
+        self.refresh()
+        return {"kind": kind, "path": path, "ID": ID}
+
+    def listen(self):
+        """
+        Bind the socket and answer requests from a background thread.  A socket left over by a
+        daemon that died is replaced; a live one raises ServeError.
+        """
+        if os.path.exists(self.socket_path):
+            if request(self.novel.path, "ping") is not None:
+                raise ServeError(f"A daemon is already serving {self.novel.path}")
+            os.unlink(self.socket_path)
+
+        import socketserver
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        message = json.loads(line)
+                    except ValueError as exc:
+                        reply = {"ok": False, "error": f"Bad request: {exc}"}
+                    else:
+                        if isinstance(message, dict):
+                            reply = server.handle(message)
+                        else:
+                            reply = {"ok": False, "error": "Bad request: not an object"}
+                    self.wfile.write(json.dumps(reply).encode("utf8") + b"\n")
+                    self.wfile.flush()
+
+        manifest.get_book_dir(self.novel.path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def run(self, timeout=1):
+        """
+        Listen and keep the snapshot fresh from the watcher until `stop()` is called.
+        """
+        self.listen()
+        try:
+            while not self._stopped.is_set():
+                if not self.live:
+                    self._stopped.wait(timeout)
+                    continue
+                if self.watcher.ready(timeout):
+                    time.sleep(self.watcher.SETTLE)
+                    self.catch_up()
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+        if self.watcher is not None:
+            self.watcher.close()
@@ -10,7 +10,10 @@ import os
 import time
 
 import book.git_utils as git_utils
-import tiddlywiki_parser
+import book.manifest as manifest
+import book.profiling as profiling
+import book.structure as struct
+import book.world as world
 
 
 class Session(object):
@@ -18,14 +21,35 @@ class Session(object):
     COMMIT_THRESHOLD = 600  # 600
     CHANGE_THRESHOLD = 5
 
-    def __init__(self, novel, goal, start, tiddlywiki=None):
+    def __init__(self, novel, goal, start, tiddlywiki=None, watcher=None):
         self.novel = novel
         self.last_commit = time.time()
         self.last_change = 0
         self.tiddlywiki = tiddlywiki
+
+        self._files = {}  # path -> (stat key, word count)
+        self._total = 0
+        self._changed = False
+        self._touched = set()  # paths changed since the last commit
+        self.watcher = None
+        self.refresh()
+        # Whatever was uncommitted before the session started is confirmed by the first check.
+        self._touched = {novel.outline_path}
+        self.repo = git_utils.get_repo(novel.path, silent=True)
+        self.pusher = None
+        if self.repo is not None and self.repo.remotes:
+            self.pusher = git_utils.PushWorker(novel.path)
+            self.pusher.start()
+        if watcher is not None:
+            self.watch(watcher)
+        self.novel.manifest.save()
+
+        self.world_sync = None
         if self.tiddlywiki:
             if not os.path.exists(novel.world_building_path):
                 os.makedirs(novel.world_building_path)
+            self.world_sync = world.WorldSync(self.tiddlywiki, novel)
+            self.world_sync.start()
 
         if goal is None:
             self.goal = 1000
@@ -33,54 +57,177 @@ class Session(object):
             self.goal = goal
 
         if start is None:
-            self.start = novel.outline.count
+            self.start = self.total_count
         else:
             self.start = start
 
+    def refresh(self):
+        """
+        Bring count, total and changed state up to date in a single stat walk of the outline.
+
+        Word counts are cached per file in the novel's manifest, so only files whose stat changed
+        since the last refresh are read and counted again.
+        """
+        files = {}
+        for path, stat in self.novel.outline.walk_stats():
+            files[path] = (manifest.stat_key(stat), self._count_file(path, stat))
+
+        changed = {
+            path
+            for path in set(files) | set(self._files)
+            if files.get(path) != self._files.get(path)
+        }
+        self._touched.update(changed)
+        self._set_changed(bool(changed))
+        self._files = files
+        # A full walk, so entries of deleted or renamed files can go.
+        self.novel.manifest.prune()
+        self._total = sum(count for _, count in files.values())
+
+    def update(self, paths):
+        """
+        Apply the changed paths reported by a watcher.
+
+        Files the session already counts are recounted one by one.  Anything else (new or deleted
+        files, folder changes) or `paths` being None falls back to a full `refresh()`.
+        """
+        if paths is None or not paths <= set(self._files):
+            return self.refresh()
+
+        changed = False
+        for path in paths:
+            try:
+                profiling.count("stat")
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return self.refresh()
+            key = manifest.stat_key(stat)
+            old_key, old_count = self._files[path]
+            if key != old_key:
+                count = self._count_file(path, stat)
+                self._files[path] = (key, count)
+                self._total += count - old_count
+                self._touched.add(path)
+                changed = True
+        self._set_changed(changed)
+
+    def watch(self, watcher):
+        """
+        Take change notifications from `watcher` instead of rescanning the outline every tick.
+        """
+        self.watcher = watcher
+
+    def wait(self, timeout):
+        """
+        Block until the watcher reports changes or `timeout` seconds pass, then apply them.
+        """
+        if self.watcher is None:
+            time.sleep(timeout)
+            self.refresh()
+        else:
+            self.update(self.watcher.wait(timeout))
+
+    def _count_file(self, path, stat):
+        entry = self.novel.manifest.get(path, stat)
+        if entry is None:
+            node = struct.Scene(path, is_file=True, count_rules=self.novel.count_rules)
+            node.reload_header()
+            self.novel.manifest.update(
+                path, stat, node.header_dict, node.local_count, node.pk
+            )
+            return node.local_count
+        return entry["count"]
+
+    def _set_changed(self, changed):
+        self._changed = changed
+        if changed:
+            self.last_change = time.time()
+
     @property
     def total_count(self):
-        return self.novel.outline.count
+        return self._total
 
     @property
     def count(self):
-        return self.novel.outline.count - self.start
+        return self._total - self.start
 
     @property
     def is_changed(self):
-        changed = self.novel.outline.is_changed
-        if changed:
-            self.last_change = time.time()
-        return changed
+        """
+        Whether anything changed in the last `refresh()`.
+        """
+        return self._changed
+
+    @property
+    def is_dirty(self):
+        """
+        Whether anything the session touched since the last commit still differs from git.
+
+        Without touched paths this is answered without running git at all; otherwise a single
+        `git status --porcelain` scoped to those paths confirms it.
+        """
+        if self.repo is None or not self._touched:
+            return False
+        dirty = git_utils.is_dirty(self.novel.path, repo=self.repo, paths=self._touched)
+        if not dirty:
+            # Edits that were reverted before the commit leave nothing to check next time.
+            self._touched.clear()
+        return dirty
+
+    @property
+    def push_status(self):
+        """
+        State of the background push, or an empty string if there is no remote to push to.
+        """
+        if self.pusher is None:
+            return ""
+        return self.pusher.status
+
+    def close(self, timeout=None):
+        """
+        Stop the background workers, giving a running push `timeout` seconds to finish, and
+        close the watcher.
+        """
+        if self.watcher is not None:
+            self.watcher.close()
+        if self.world_sync is not None:
+            self.world_sync.stop(timeout)
+        if self.pusher is not None:
+            self.pusher.stop(timeout)
 
     def commit(self):
-        # print(
-        #     f"{time.time() - self.last_commit} || {time.time() - self.last_change} || {git_utils.is_dirty(self.novel.path)}"
-        # )
-        if not git_utils.is_repo(self.novel.path):
+        if self.repo is None:
             # No git repo, skip
             return
 
+        if self.world_sync is not None and self.world_sync.pop_changed():
+            self._touched.add(self.novel.world_building_path)
+
         commit_delta = time.time() - self.last_commit
         change_delta = time.time() - self.last_change
         if (
             change_delta > self.CHANGE_THRESHOLD
             and commit_delta > self.COMMIT_THRESHOLD
-            and git_utils.is_dirty(self.novel.path)
+            and self.is_dirty
         ):
-            self.get_tiddlywiki()
             self.do_commit()
 
     def do_commit(self):
         print("\ncommiting")
-        git_utils.commit(self.novel.path)
+        self.novel.manifest.save()
+        git_utils.commit(
+            self.novel.path, repo=self.repo, push=False, paths=self._touched
+        )
+        self._touched.clear()
+        if self.pusher is not None:
+            self.pusher.request()
         self.last_commit = time.time()
 
     def get_tiddlywiki(self):
-        if self.tiddlywiki:
+        """
+        Sync the tiddlywiki right now instead of waiting for the background schedule.
+        """
+        if self.world_sync is not None:
             print("\ngetting tiddly")
-            raw_content = tiddlywiki_parser.read(self.tiddlywiki)
-            tiddlywiki = tiddlywiki_parser.TiddlyWiki(raw_content)
-            tiddlywiki_parser.export(
-                os.path.join(self.novel.world_building_path, "tiddlers.json"),
-                tiddlywiki.export_list(),
-            )
+            if self.world_sync.sync():
+                self._touched.add(self.novel.world_building_path)
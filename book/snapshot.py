@@ -0,0 +1,156 @@
+"""
+Frozen, read-only view of a loaded novel.
+
+Read-only commands (stats, compile) walk this instead of the live `Outline` objects.  The nodes are
+immutable tuples with no per-instance dict, children are sorted once when the snapshot is taken
+and the subtree aggregates (words, bytes, max ID, scene count) are computed bottom-up in the same
+pass, so nothing is re-sorted, re-parsed or re-counted while the commands run.
+"""
+
+import collections
+import operator
+
+import book.metadata as mdata
+import book.structure as struct
+
+NOVEL = "novel"
+FOLDER = "folder"
+SCENE = "scene"
+
+_NodeTuple = collections.namedtuple(
+    "_NodeTuple",
+    [
+        "kind",
+        "path",
+        "file_path",
+        "order",
+        "title",
+        "pk",
+        "is_chapter",
+        "words",
+        "bytes",
+        "children",
+        "total_words",
+        "total_bytes",
+        "max_pk",
+        "scene_count",
+    ],
+)
+
+
+class Node(_NodeTuple):
+    """
+    One folder or scene of the snapshot.  `words` and `bytes` are for the node's own file, the
+    `total_*`, `max_pk` and `scene_count` values cover the node and everything below it.
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_scene(self):
+        return self.kind == SCENE
+
+    @property
+    def count(self):
+        return self.total_words
+
+    @property
+    def body(self):
+        """
+        The body of the node's file, read on demand since the snapshot doesn't hold any text.
+        """
+        return struct.Scene(self.file_path, is_file=True).body
+
+    def folders(self):
+        """
+        Every folder below this node, depth first, in the order of `Outline.folders(recursive=True)`.
+        """
+        for child in self.children:
+            if not child.is_scene:
+                yield child
+                yield from child.folders()
+
+    def scenes(self):
+        """
+        Every scene below this node in reading order, like `Outline.scenes(recursive=True)`.
+        """
+        for child in self.children:
+            if child.is_scene:
+                yield child
+            else:
+                yield from child.scenes()
+
+    def walk(self):
+        """
+        This node and everything below it in reading order.
+        """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def iter_compile(self):
+        """
+        Yield the compile fragments of this node and everything below it in reading order.
+
+        Bodies are read one at a time as the fragments are consumed.
+        """
+        yield self.fragment()
+        for child in self.children:
+            yield from child.iter_compile()
+
+    def fragment(self) -> str:
+        """
+        The compiled markdown of this node alone: its heading (for chapters) and its body.
+        """
+        heading = ""
+        if self.is_chapter:
+            heading = f"\n\n# {self.title}\n\n"
+        return heading + self.body
+
+    def compile_string(self) -> str:
+        return "".join(self.iter_compile())
+
+
+def take(novel):
+    """
+    Load `novel` (through its manifest) and return the root node of its snapshot.
+    """
+    return build(novel.load(), NOVEL)
+
+
+def build(outline, kind=NOVEL):
+    """
+    Snapshot the already loaded `outline` node and everything below it.
+    """
+    if kind == SCENE:
+        children = ()
+    else:
+        # Same order as `Outline.children`: stable, folders ahead of scenes on equal order.
+        ordered = sorted(
+            outline.folders() + outline.scenes(), key=operator.attrgetter("order")
+        )
+        children = tuple(
+            build(child, SCENE if isinstance(child, struct.Scene) else FOLDER)
+            for child in ordered
+        )
+
+    header = outline.header_dict
+    words = outline.local_count
+    file_bytes = outline.file_bytes
+    pk = outline.pk
+    return Node(
+        kind=kind,
+        path=outline.path,
+        file_path=outline.file_path,
+        order=None if kind == NOVEL else outline.order,
+        title=header.get(mdata.TITLE, outline.filename),
+        pk=pk,
+        is_chapter=header.get(mdata.STRUCTURE, mdata.SCENE) == mdata.CHAPTER,
+        words=words,
+        bytes=file_bytes,
+        children=children,
+        total_words=words + sum(child.total_words for child in children),
+        total_bytes=file_bytes + sum(child.total_bytes for child in children),
+        max_pk=max([pk] + [child.max_pk for child in children]),
+        scene_count=(kind == SCENE) + sum(child.scene_count for child in children),
+    )
@@ -0,0 +1,99 @@
+"""
+Stats sheet for a novel, rendered as text, csv or json.
+
+Everything comes from one snapshot of the novel, whose word and byte subtotals were already
+computed bottom-up when it was taken, so a sheet is a single walk over the tree.
+"""
+import json
+import os
+import sys
+
+import book.snapshot as snapshot
+
+TEXT = "text"
+CSV = "csv"
+JSON = "json"
+FORMATS = (TEXT, CSV, JSON)
+
+FIELDS = ("kind", "depth", "order", "pk", "title", "words", "bytes", "scenes", "path")
+
+
+def rows(root, folders=None):
+    """
+    One dict per node below `root` in reading order.  Folder rows carry the subtotals of
+    everything below them.  `folders` True keeps only folders, False only scenes and None
+    keeps both.
+    """
+
+    def walk(node, depth):
+        for child in node.children:
+            if folders is None or folders != child.is_scene:
+                yield row(child, depth)
+            if not child.is_scene:
+                yield from walk(child, depth + 1)
+
+    def row(node, depth):
+        return {
+            "kind": node.kind,
+            "depth": depth,
+            "order": node.order,
+            "pk": node.pk,
+            "title": node.title,
+            "words": node.total_words,
+            "bytes": node.total_bytes,
+            "scenes": node.scene_count,
+            "path": os.path.relpath(node.path, root.path),
+        }
+
+    return walk(root, 1)
+
+
+def totals(root):
+    return {
+        "count": root.count,
+        "bytes": root.total_bytes,
+        "scenes": root.scene_count,
+        "max_pk": root.max_pk,
+    }
+
+
+def render(root, fmt=TEXT, folders=False, out=None):
+    """
+    Write the stats sheet for the snapshot `root` to `out` (stdout by default).
+
+    The text sheet lists either scenes or folders, in the format `book stats` always had.  The
+    csv and json sheets list every folder and scene with byte totals; `folders` limits them to
+    folders.
+    """
+    if out is None:
+        out = sys.stdout
+    if fmt == TEXT:
+        for node in rows(root, folders=folders):
+            print(f"{node['order']:02d}, {node['words']:>5}, {node['title']}", file=out)
+        print(f"count = {root.count}", file=out)
+        print(f"max pk = {root.max_pk}", file=out)
+    elif fmt == CSV:
+        import csv
+
+        writer = csv.DictWriter(out, fieldnames=FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerow(
+            {
+                "kind": snapshot.NOVEL,
+                "depth": 0,
+                "pk": root.pk,
+                "title": root.title,
+                "words": root.count,
+                "bytes": root.total_bytes,
+                "scenes": root.scene_count,
+                "path": ".",
+            }
+        )
+        writer.writerows(rows(root, folders=True if folders else None))
+    elif fmt == JSON:
+        sheet = totals(root)
+        sheet["nodes"] = list(rows(root, folders=True if folders else None))
+        json.dump(sheet, out, indent=2)
+        out.write("\n")
+    else:
+        raise ValueError(f"Unknown stats format {fmt!r}; expected one of {FORMATS}")
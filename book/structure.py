@@ -9,20 +9,73 @@ some differences.  The README.md should have relevant information.
 """
 
 import logging
+import operator
 import os
-import re
 import string
-import sys
 import time
 
 from typing import Optional
 
+import book.compile as compiler
+import book.config as config
 import book.metadata as mdata
 import book.fs_utils as fs_utils
+import book.ids as ids
+import book.index as index
+import book.manifest as manifest
+import book.profiling as profiling
+import book.rename as rename
+import book.snapshot as snapshot
+import book.transform as transform
+import book.wordcount as wordcount
 
-logging.basicConfig(stream=sys.stdout, level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+SCENE_EXTENSIONS = (".txt", ".md")
+
+
+def order_from_filename(filename):
+    """
+    The order number at the front of a folder or scene filename (`12-title.md` -> 12) or None.
+    """
+    try:
+        num = filename.split("-")[0]
+        num = float(num)
+        if num == int(num):
+            num = int(num)
+        return num
+    except (IndexError, ValueError):
+        return None
+
+
+def reading_order_key(outline_path, file_path):
+    """
+    Sort key for the files below `outline_path` in the order a tree load visits them: the
+    outline, every folder depth first, then every scene, each level by order number.
+    """
+    parts = os.path.relpath(file_path, outline_path).split(os.sep)
+    is_scene = is_scene_filename(parts[-1])
+    if not is_scene:
+        parts = parts[:-1]  # a folder's file sorts as the folder
+    return is_scene, [(order_from_filename(part), part) for part in parts]
+
+
+def is_scene_filename(filename):
+    return (
+        os.path.splitext(filename)[1] in SCENE_EXTENSIONS
+        and order_from_filename(filename) is not None
+    )
+
+
+def get_novel(path, conf=None):
+    """
+    Novel for `path` set up with the word counting rules from its config.yaml.
+    """
+    if conf is None:
+        conf = config.get_config(path)
+    rules = wordcount.get_rules(conf.wordcount, conf.hyphens)
+    return Novel(path, count_rules=rules)
+
 
 class Novel(object):
     """
@@ -33,9 +86,13 @@ class Novel(object):
     WORLD_BUILDING_DIR = "world"
     ANCHOR = "MANUSKRIPT"
 
-    def __init__(self, path):
+    def __init__(self, path, count_rules=None):
         self.path = path
         self._outline = None
+        self._index = None
+        self.count_rules = count_rules or wordcount.DEFAULT_RULES
+        self.manifest = manifest.Manifest(path, rules=self.count_rules.key)
+        self.ids = ids.IdAllocator(self)
 
     @property
     def outline_path(self):
@@ -48,9 +105,88 @@ class Novel(object):
     @property
     def outline(self):
         if self._outline is None:
-            self._outline = Outline(self.outline_path)
+            self._outline = Outline(
+                self.outline_path, manifest=self.manifest, count_rules=self.count_rules
+            )
         return self._outline
 
+    def load(self):
+        """
+        Load the whole outline, reading only the files that changed since the manifest was last
+        saved, and persist the refreshed manifest.
+        """
+        self.outline.load_tree()
+        self.manifest.prune()
+        self.manifest.save()
+        id_index = index.IdIndex()
+        outline = self.outline
+        for node in [outline] + outline.folders(recursive=True) + outline.scenes(recursive=True):
+            id_index.add(node.pk, node.file_path)
+        self._index = id_index
+        return self.outline
+
+    def build_index(self):
+        """
+        Index the IDs from a stat walk of the outline and the manifest, without loading the
+        tree.  Only files that changed since the manifest was saved have their header read.
+        """
+        pks = []
+        for path, stat in self.outline.walk_stats():
+            entry = self.manifest.get(path, stat)
+            if entry is None:
+                entry = self.read_into_manifest(path, stat)
+            pks.append((reading_order_key(self.outline_path, path), entry["ID"], path))
+        self.manifest.prune()
+        self.manifest.save()
+
+        # Added in reading order, so the same path keeps a duplicated ID as in a tree load.
+        id_index = index.IdIndex()
+        for _, pk, path in sorted(pks):
+            id_index.add(pk, path)
+        return id_index
+
+    def read_into_manifest(self, file_path, stat=None):
+        """
+        Read the header of `file_path` into its manifest entry and return the entry.  Call
+        `manifest.save()` afterwards.
+        """
+        if stat is None:
+            profiling.count("stat")
+            stat = os.stat(file_path)
+        node = Scene(file_path, is_file=True, count_rules=self.count_rules)
+        node.reload_header()
+        self.manifest.update(file_path, stat, node.header_dict, node.local_count, node.pk)
+        return self.manifest.get(file_path, stat)
+
+    def add_node(self, node_class, path, convert=False, title=None):
+        """
+        Create the folder or scene `path` with a fresh ID and record it in the manifest, so the
+        next allocation can still trust the manifest instead of loading the outline.
+        """
+        ID = self.ids.allocate()
+        node = node_class.create(path, convert, title=title, ID=ID)
+        self.read_into_manifest(node.file_path)
+        self.manifest.save()
+        return ID
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.build_index()
+        return self._index
+
+    def lookup(self, pk):
+        """
+        Return the file path of the folder or scene with ID `pk`, or None.
+        """
+        return self.index.lookup(pk)
+
+    def snapshot(self):
+        """
+        Load the novel and return the root of a frozen `snapshot.Node` tree for read-only work.
+        """
+        return snapshot.take(self)
+
     @classmethod
     def is_path_a_novel(cls, path):
         if not os.path.exists(path):
@@ -77,19 +213,25 @@ class Novel(object):
         return novel
 
     def compile(self) -> str:
-        single_string = self.compile_frontmatter()
-        single_string += self.outline.compile_string()
-        single_string += self.compile_backmatter()
-        single_string = self.clean_compile(single_string)
-        return single_string
+        return "".join(compiler.normalize_newlines(self.iter_compile()))
+
+    def iter_compile(self):
+        """
+        Yield the raw markdown of the whole book fragment by fragment.  Run it through
+        `compile.normalize_newlines` (or `compile.write_markdown`) to clean it.
+        """
+        root = self.snapshot()
+        yield self.compile_frontmatter()
+        yield from root.iter_compile()
+        yield self.compile_backmatter()
 
     def compile_frontmatter(self) -> str:
-        print(f'title: {self.outline.title}')
+        logger.debug(f'title: {self.outline.title}')
         yaml = '---\n'
         yaml += f'title: {self.outline.title}\n'
         yaml += f'author: Todd Kaye\n'
         yaml += '...\n\n'
-        print(yaml)
+        logger.debug(yaml)
         return yaml
         # return f"{self.outline.title}\n\n"
         # return ""
@@ -115,12 +257,16 @@ class Outline(object):
     DEFAULT_FILENAME = "novel.md"
     CACHE_PERIOD = 10  # seconds
 
-    def __init__(self, path):
+    def __init__(self, path, is_file=None, manifest=None, count_rules=None):
         if "outline" not in path:
             path = os.path.join(path, "outline")
         self.path = path
 
-        if os.path.isfile(path):
+        if is_file is None:
+            is_file = os.path.isfile(path)
+        self._is_file = is_file
+
+        if is_file:
             self.folder_path, self.filename = os.path.split(path)
         else:
             self.folder_path = path
@@ -130,8 +276,13 @@ class Outline(object):
         self._scenes = None
         self._other_files = None
 
+        self.manifest = manifest
+        self.count_rules = count_rules or wordcount.DEFAULT_RULES
+
         self._header_dict = None
         self._body = None
+        self._count = None
+        self._bytes = None
 
         self._cached_bytes = 0
         self._dir_read_time = 0
@@ -207,7 +358,7 @@ class Outline(object):
     @property
     def header_dict(self):
         if self._header_dict is None or self.file_cache_expired:
-            self.reload_file()
+            self.reload_header()
         return self._header_dict
 
     @property
@@ -252,14 +403,42 @@ class Outline(object):
                 safe_name += "-"
         return safe_name
 
+    @property
+    def local_count(self):
+        """
+        Word count of this node's own file, not including any children.
+        """
+        if self._count is None or self.file_cache_expired:
+            if self._body is None or self.file_cache_expired:
+                # Stream the file rather than loading a body nobody asked for.
+                try:
+                    self._count = wordcount.count_file(self.file_path, self.count_rules)
+                except FileNotFoundError:
+                    self._count = 0
+            else:
+                self._count = wordcount.count_words(self._body, self.count_rules)
+        return self._count
+
     @property
     def count(self):
-        count = len(self.body.split())
+        count = self.local_count
         # logger.debug(f"count={count}; {self.filename}")
         for folder in self.children:
             count += folder.count
         return count
 
+    @property
+    def file_bytes(self):
+        """
+        Size of this node's own file, 0 if it doesn't exist.
+        """
+        if self._bytes is None:
+            try:
+                return os.path.getsize(self.file_path)
+            except FileNotFoundError:
+                return 0
+        return self._bytes
+
     @property
     def byte_count(self):
         try:
@@ -351,47 +530,173 @@ class Outline(object):
             self.reload_dir()
         return self._other_files
 
-    def reload_dir(self):
+    def reload_dir(self, recursive=False):
+        """
+        Rebuild the folder/scene lists for this directory in a single `os.scandir` pass.
+
+        The file/directory decision comes from the cached `DirEntry` type info, so no extra stat
+        calls are made per entry.  With `recursive` set the whole hierarchy underneath is loaded
+        in the same walk.
+        """
         self._folders = []
         self._scenes = []
         self._other_files = []
-        for file in os.listdir(self.path):
-            if file == self.DEFAULT_FILENAME:
-                self.reload_file()
-            file_path = os.path.join(self.path, file)
-            # logger.debug(file_path)
-            if os.path.isfile(file_path):
-                scene = Scene(file_path)
-                if scene.is_scene:
-                    self._scenes.append(scene)
-                else:
-                    self._other_files.append(file_path)
+        profiling.count("listdir")
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.name == self.DEFAULT_FILENAME:
+                    if self.manifest is None:
+                        self.reload_file()
+                    else:
+                        profiling.count("stat")
+                        self.reload_from_manifest(entry.stat())
+                # logger.debug(entry.path)
+                if entry.is_file():
+                    scene = Scene(
+                        entry.path,
+                        is_file=True,
+                        manifest=self.manifest,
+                        count_rules=self.count_rules,
+                    )
+                    if scene.is_scene:
+                        if self.manifest is not None:
+                            profiling.count("stat")
+                            scene.reload_from_manifest(entry.stat())
+                        self._scenes.append(scene)
+                    else:
+                        self._other_files.append(entry.path)
 
-            else:
-                # directory
-                folder = Folder(file_path)
-                if folder.order is not None:
-                    self._folders.append(folder)
                 else:
-                    self._other_files.append(folder)
-
-        self._folders = sorted(self._folders)
-        self._scenes.sort()
+                    # directory
+                    folder = Folder(
+                        entry.path,
+                        is_file=False,
+                        manifest=self.manifest,
+                        count_rules=self.count_rules,
+                    )
+                    if folder.order is not None:
+                        self._folders.append(folder)
+                    else:
+                        self._other_files.append(folder)
+
+        # Sort on the key so each filename is parsed once instead of on every comparison.
+        self._folders.sort(key=operator.attrgetter("order"))
+        self._scenes.sort(key=operator.attrgetter("order"))
         self._dir_read_time = time.time()
 
+        if recursive:
+            for folder in self._folders:
+                folder.reload_dir(recursive=True)
+
+    def load_tree(self):
+        """
+        Load the complete folder/scene hierarchy below this node in one walk.
+        """
+        self.reload_dir(recursive=True)
+
+    def walk_stats(self):
+        """
+        Yield `(file_path, stat)` for this node's file and every folder and scene file below it.
+
+        Nothing is read or parsed, it is one `os.scandir` pass per directory.  The files are the
+        same ones `count` adds up.
+        """
+        return self._walk_stats(self.path, self.DEFAULT_FILENAME)
+
+    @classmethod
+    def _walk_stats(cls, path, default_filename):
+        folders = []
+        profiling.count("listdir")
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    if entry.name == default_filename or is_scene_filename(entry.name):
+                        profiling.count("stat")
+                        yield entry.path, entry.stat()
+                elif order_from_filename(entry.name) is not None:
+                    folders.append(entry.path)
+        for folder_path in folders:
+            yield from cls._walk_stats(folder_path, Folder.DEFAULT_FILENAME)
+
+    def reload_from_manifest(self, stat):
+        """
+        Take the header and word count from the manifest while `stat` still matches its entry,
+        otherwise read the file and refresh the entry.
+        """
+        cached = self.manifest.get(self.file_path, stat)
+        if cached is None:
+            # The count streams the body, it doesn't need to be loaded.
+            self.reload_header()
+            self.manifest.update(
+                self.file_path, stat, self._header_dict, self.local_count, self.pk
+            )
+        else:
+            self._header_dict = dict(cached["header"])
+            self._count = cached["count"]
+            self._body = None
+            self._file_read_time = time.time()
+        self._bytes = stat.st_size
+
+    def reload_header(self, raise_errors=False):
+        """
+        Read only the metadata header, stopping at the first blank line.
+
+        The header comes out the same as the one `reload_file` splits off.  The body is loaded
+        when `body` is used.
+        """
+        try:
+            lines = []
+            has_body = False
+            with open(self.file_path) as fp:
+                for line in fp:
+                    if not lines and not line.strip():
+                        # Leading whitespace is stripped like in reload_file.
+                        continue
+                    if line == "\n":
+                        # reload_file strips the whole file before splitting, so whitespace
+                        # lines only stay in the header when a body follows.  Usually the
+                        # next line already says so.
+                        has_body = any(rest.strip() for rest in fp)
+                        break
+                    lines.append(line)
+        except FileNotFoundError:
+            if raise_errors:
+                raise
+            lines = []
+            has_body = False
+        header = "".join(lines).lstrip()
+        profiling.count("read")
+        profiling.count("read_bytes", len(header))
+        if has_body:
+            header = header[:-1]
+        else:
+            header = header.rstrip()
+        self._raw_header = header
+        with profiling.timer("parse"):
+            self._header_dict = self.extract_dict_from_file(header)
+        self._body = None
+        self._count = None
+        self._bytes = None
+        self._file_read_time = time.time()
+
     def reload_file(self, raise_errors=False):
         # logger.debug(f"filespec: {self.folder_path} || {self.filename}")
         try:
             with open(self.file_path) as fp:
                 raw_content = fp.read().strip()
+                profiling.count("read")
+                profiling.count("read_bytes", len(raw_content))
                 # logger.debug(f"rc = {raw_content}")
                 try:
                     header, body = raw_content.split("\n\n", 1)
                 except ValueError:
                     header, body = raw_content, ""
                 self._raw_header = header
-                self._header_dict = self.extract_dict_from_file(header)
+                with profiling.timer("parse"):
+                    self._header_dict = self.extract_dict_from_file(header)
                 self._body = body
+                self._count = None
+                self._bytes = None
                 self._file_read_time = time.time()
         except FileNotFoundError:
             if raise_errors:
@@ -399,6 +704,7 @@ class Outline(object):
             self._raw_header = ""
             self._header_dict = {}
             self._body = ""
+            self._count = None
 
     @staticmethod
     def extract_dict_from_file(content):
@@ -427,31 +733,14 @@ class Outline(object):
         return len(str(len(self.folders()) + len(self.scenes())))
 
     def auto_rename(self, dry_run):
-        digits = self.order_digits
-        local_ops = []
-        child_ops = []
-        for child in self.folders():
-            ops = child.auto_rename(dry_run)
-            child_ops += ops
-
-        for idx, child in enumerate(self.children):
-            old_path = child.path
-            ext = ""
-            if isinstance(child, Scene):
-                ext = ".md"
-            new_filename = f"{idx:0{digits}}-{child.safe_title}{ext}"
-            new_path = os.path.join(self.folder_path, new_filename)
-            if old_path != new_path and os.path.exists(new_path):
-                new_filename = f"{idx:0{digits}}-{child.safe_title}-{child.pk}{ext}"
-                new_path = os.path.join(self.folder_path, new_filename)
-            local_ops.append((old_path, new_path))
-
+        """
+        Rename every folder and scene after its order and title, see `book.rename`.
+        Returns the (old, new) path pairs.
+        """
+        rename_plan = rename.plan(self)
         if not dry_run:
-            for op in local_ops:
-                if op[0] != op[1]:
-                    print(f"renaming {op[0]} --> {op[1]}")
-                    os.rename(op[0], op[1])
-        return local_ops + child_ops
+            rename.apply(rename_plan)
+        return [tuple(op) for op in rename_plan]
 
     def rewrite(self, header=None, body=None):
         """
@@ -460,7 +749,7 @@ class Outline(object):
         if header is None:
             header = self.header_dict
         if body is None:
-            body = self._body
+            body = self.body
         if header or body:
             try:
                 with open(self.file_path, "w") as fp:
@@ -470,29 +759,10 @@ class Outline(object):
                 raise
 
     def transform_hard_crlf(self):
-        self._transform_sub_regex(r"\n+", "\n")
-        for child in self.children:
-            child.transform_hard_crlf()
+        return transform.run(self, ["hard-crlf"])
 
     def transform_soft_crlf(self):
-        self._transform_sub_regex(r"\n", "\n\n")
-        for child in self.children:
-            child.transform_soft_crlf()
-
-    def _transform_sub_regex(self, pattern, replace):
-        logger.debug(f"file_path: {self.file_path}")
-        try:
-            self.reload_file(raise_errors=True)
-            body = re.sub(pattern, replace, self._body)
-            if body != self._body:
-                logger.debug("made a change")
-                self.rewrite(body=body)
-                self.reload_file
-        except FileNotFoundError:
-            # File doesn't exist
-            logger.warn(
-                f"Trying to transform file that does not exist: {self.file_path}"
-            )
+        return transform.run(self, ["soft-crlf"])
 
     def compile_string(self) -> str:
         single_string = self.compile_frontmatter()
@@ -519,8 +789,12 @@ class Folder(Outline):
 
     DEFAULT_FILENAME = "folder.txt"
 
-    def __init__(self, path, filename="folder.txt"):
-        super().__init__(path)
+    def __init__(
+        self, path, filename="folder.txt", is_file=None, manifest=None, count_rules=None
+    ):
+        super().__init__(
+            path, is_file=is_file, manifest=manifest, count_rules=count_rules
+        )
 
     @property
     def structure_metadata(self) -> str:
@@ -539,17 +813,10 @@ class Folder(Outline):
 
     @property
     def order(self):
-        try:
-            filename = self.filename
-            if self.filename == self.DEFAULT_FILENAME:
-                filename = os.path.split(self.folder_path)[1]
-            num = filename.split("-")[0]
-            num = float(num)
-            if num == int(num):
-                num = int(num)
-            return num
-        except (IndexError, ValueError):
-            return None
+        filename = self.filename
+        if self.filename == self.DEFAULT_FILENAME:
+            filename = os.path.split(self.folder_path)[1]
+        return order_from_filename(filename)
 
     def __eq__(self, other):
         return self.order == other.order
@@ -578,8 +845,10 @@ class Scene(Folder):
 
     DEFAULT_FILENAME = None
 
-    def __init__(self, path):
-        super().__init__(path)
+    def __init__(self, path, is_file=None, manifest=None, count_rules=None):
+        super().__init__(
+            path, is_file=is_file, manifest=manifest, count_rules=count_rules
+        )
 
     @property
     def is_scene(self):
@@ -588,11 +857,7 @@ class Scene(Folder):
         # logger.debug(os.path.splitext(self.filename)[1] in (".txt", ".md"))
         # logger.debug(self.order is not None)
 
-        if (
-            os.path.isfile(self.path)
-            and (os.path.splitext(self.filename)[1] in (".txt", ".md"))
-            and (self.order is not None)
-        ):
+        if self._is_file and is_scene_filename(self.filename):
             # logger.debug("is scene")
             return True
         else:
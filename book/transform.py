@@ -0,0 +1,125 @@
+"""
+Transformations of the text of every folder and scene in the outline.
+
+Transforms are registered by name and only ever touch the body of a file, never the metadata
+header.  `run()` chains the requested transforms into one pass over each file, spreads the files
+over a thread pool and only writes the files whose content actually changed.
+"""
+
+import collections
+import logging
+import re
+
+import book.metadata as mdata
+
+logger = logging.getLogger(__name__)
+
+Transform = collections.namedtuple("Transform", ["name", "help", "fx"])
+FileResult = collections.namedtuple("FileResult", ["path", "counts", "written"])
+
+TRANSFORMS = {}
+
+
+def register(name, help):
+    """
+    Register `fx(body) -> (new_body, number_of_changes)` as the transform `name`.
+    """
+
+    def decorator(fx):
+        TRANSFORMS[name] = Transform(name, help, fx)
+        return fx
+
+    return decorator
+
+
+@register("soft-crlf", "Create whitespace between paragraphs for easier editing.")
+def soft_crlf(body):
+    return re.subn(r"\n", "\n\n", body)
+
+
+@register("hard-crlf", "Remove whitespace between paragraphs.")
+def hard_crlf(body):
+    return re.subn(r"\n{2,}", "\n", body)
+
+
+@register("trailing-whitespace", "Strip spaces and tabs from the end of lines.")
+def trailing_whitespace(body):
+    return re.subn(r"[ \t]+$", "", body, flags=re.MULTILINE)
+
+
+@register("em-dashes", "Turn -- into an em-dash (markdown rules like --- are left alone).")
+def em_dashes(body):
+    return re.subn(r"(?<!-)--(?!-)", "\u2014", body)
+
+
+OPENING_CONTEXT = r"(^|[\s(\[{\u2014\u2013-])"
+
+
+@register("smart-quotes", "Curly quotes and apostrophes instead of straight ones.")
+def smart_quotes(body):
+    body, opening_double = re.subn(OPENING_CONTEXT + '"', "\\1\u201c", body, flags=re.M)
+    body, closing_double = re.subn('"', "\u201d", body)
+    body, opening_single = re.subn(OPENING_CONTEXT + "'", "\\1\u2018", body, flags=re.M)
+    body, closing_single = re.subn("'", "\u2019", body)
+    return body, opening_double + closing_double + opening_single + closing_single
+
+
+def get_transforms(names):
+    unknown = [name for name in names if name not in TRANSFORMS]
+    if unknown:
+        raise ValueError(
+            f"Unknown transform(s) {', '.join(unknown)}, use {', '.join(TRANSFORMS)}"
+        )
+    return [TRANSFORMS[name] for name in names]
+
+
+def iter_nodes(outline):
+    """
+    The outline node and every folder and scene below it, in reading order.
+    """
+    yield outline
+    for child in outline.children:
+        yield from iter_nodes(child)
+
+
+def transform_node(node, transforms, dry_run=False):
+    """
+    Apply `transforms` in order to the body of `node` and write the file if it changed.
+    """
+    try:
+        node.reload_file(raise_errors=True)
+    except FileNotFoundError:
+        logger.warning(f"Trying to transform file that does not exist: {node.file_path}")
+        return FileResult(node.file_path, {}, False)
+
+    body = node.body
+    counts = collections.OrderedDict()
+    for transform in transforms:
+        body, counts[transform.name] = transform.fx(body)
+
+    written = False
+    if body != node.body and not dry_run:
+        with open(node.file_path) as fp:
+            old_content = fp.read()
+        new_content = "\n\n".join([mdata.dict_to_metadata_string(node.header_dict), body])
+        if new_content != old_content:
+            logger.debug(f"transformed {node.file_path}")
+            node.rewrite(body=body)
+            written = True
+    return FileResult(node.file_path, counts, written)
+
+
+def run(outline, names, dry_run=False, jobs=None):
+    """
+    Apply the transforms `names` to every file of `outline` and return a `FileResult` per file.
+
+    The transforms are chained in the given order in a single pass over each file and files are
+    processed on a pool of `jobs` threads.  With `dry_run` nothing is written, the results only
+    report how many changes each transform would make.
+    """
+    transforms = get_transforms(names)
+    nodes = list(iter_nodes(outline))
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(lambda node: transform_node(node, transforms, dry_run), nodes))
@@ -0,0 +1,209 @@
+"""
+Change notification for the outline directory, so `session` only does work when a file was saved.
+
+On Linux `InotifyWatcher` talks to inotify through ctypes and reports the changed paths within
+milliseconds.  Anywhere else, or if inotify can't be set up, `PollingWatcher` waits out the interval
+and asks for a full rescan, which is how session always worked.
+
+`wait()` returns a set of changed paths (empty if nothing happened) or None when the caller has to
+assume that anything might have changed.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct as cstruct
+import sys
+import time
+
+import book.structure as struct
+
+logger = logging.getLogger(__name__)
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+EVENT_HEADER = cstruct.Struct("iIII")
+NODE_FILENAMES = (struct.Outline.DEFAULT_FILENAME, struct.Folder.DEFAULT_FILENAME)
+
+
+class PollingWatcher(object):
+    """
+    Fallback watcher.  It has no idea what changed so every wait ends in a full rescan.
+    """
+
+    REPORTS_CHANGES = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return None
+
+    def poll(self):
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class InotifyWatcher(object):
+    """
+    Watches every directory of the outline with inotify.
+
+    Folders created or renamed while the watcher runs (`book new`, `book rename`) get a watch as
+    soon as their event is seen.
+    """
+
+    SETTLE = 0.05  # seconds, lets an editor finish a multi step save.
+    REPORTS_CHANGES = True
+
+    def __init__(self, path):
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        self.path = path
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}  # wd -> directory path
+        self.add_tree(path)
+
+    def add_tree(self, path):
+        """
+        Watch `path` and every directory below it.
+        """
+        self._add_watch(path)
+        for dirpath, dirnames, _ in os.walk(path):
+            for dirname in dirnames:
+                self._add_watch(os.path.join(dirpath, dirname))
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                # Gone again before we got to it.
+                return
+            raise OSError(err, os.strerror(err), path)
+        self._paths[wd] = path
+
+    def _remove_tree(self, path):
+        prefix = path + os.sep
+        for wd, watched in list(self._paths.items()):
+            if watched == path or watched.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._paths[wd]
+
+    def ready(self, timeout):
+        """
+        Block until events are queued or `timeout` seconds pass.  Doesn't read the events.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(ready)
+
+    def wait(self, timeout):
+        if not self.ready(timeout):
+            return set()
+        time.sleep(self.SETTLE)
+        return self._read_events()
+
+    def poll(self):
+        """
+        The changes queued right now, without waiting for any.
+        """
+        if not self.ready(0):
+            return set()
+        return self._read_events()
+
+    def _read_events(self):
+        changed = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                directory = self._paths.get(wd)
+                if directory is None:
+                    continue
+                if not name:
+                    # IN_DELETE_SELF / IN_MOVE_SELF on a watched directory.
+                    changed.add(directory)
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & IN_MOVED_FROM:
+                        self._remove_tree(path)
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        self.add_tree(path)
+                    changed.add(path)
+                elif name in NODE_FILENAMES or struct.is_scene_filename(name):
+                    changed.add(path)
+        if rescan:
+            logger.warning("inotify queue overflowed, rescanning the outline")
+            return None
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_watcher(path):
+    """
+    Return an inotify watcher for `path` if the platform supports it, otherwise a polling one.
+    """
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError) as exc:
+        logger.info(f"inotify unavailable ({exc}), polling {path}")
+        return PollingWatcher(path)
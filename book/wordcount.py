@@ -0,0 +1,233 @@
+"""
+Word counting.
+
+Plain counts are `str.split()` over the body (with dashes turned into spaces first when hyphenated
+words are split), which is the fastest way Python has to count whitespace separated tokens.  Files
+are split a chunk at a time, carrying a word cut at the end of a chunk into the next one, so only
+one chunk's tokens exist at once.  Markdown counts need to look at every line, so there the text is
+scanned line by line with a compiled pattern and only the matches are counted; files are memory
+mapped and streamed, so counting a scene never holds more than one line of it in memory.  Either
+way the metadata header is skipped.
+
+The rules decide what a word is:
+
+* `plain`: Any run of non-whitespace, the same count `len(body.split())` gives.
+* `markdown`: Heading lines, `<!-- comments -->` and tokens made only of markup (`*`, `**`, `_`,
+  `>`, `---`, ...) are not words.
+
+Either mode can count hyphenated words (`well-known`, `word—word`) as one word or one per part.
+"""
+
+import codecs
+import re
+
+import book.profiling as profiling
+
+PLAIN = "plain"
+MARKDOWN = "markdown"
+MODES = (PLAIN, MARKDOWN)
+
+HYPHENS_JOIN = "join"
+HYPHENS_SPLIT = "split"
+HYPHEN_POLICIES = (HYPHENS_JOIN, HYPHENS_SPLIT)
+
+DASH_CHARS = "-\u2010\u2011\u2012\u2013\u2014"
+DASHES = re.escape(DASH_CHARS)
+
+LINE = re.compile(r"[^\n]*\n?")
+HEADING = re.compile(r"^ {0,3}#{1,6}(?:\s|$)")
+COMMENT_START = "<!--"
+COMMENT_END = "-->"
+
+CHUNK_SIZE = 1 << 16  # bytes split at a time by plain counts
+
+BODY_START = re.compile(rb"\S")
+HEADER_END = re.compile(rb"(?:\r\n|\r(?!\n)|\n)(?:\r\n|\r(?!\n)|\n)")
+
+
+class CountRules(object):
+    """
+    A word counting rule set.  Use `get_rules()` rather than creating these directly.
+    """
+
+    def __init__(self, mode=PLAIN, hyphens=HYPHENS_JOIN):
+        if mode not in MODES:
+            raise ValueError(f"Unknown word count mode {mode}, use one of {MODES}")
+        if hyphens not in HYPHEN_POLICIES:
+            raise ValueError(
+                f"Unknown hyphen policy {hyphens}, use one of {HYPHEN_POLICIES}"
+            )
+        self.mode = mode
+        self.hyphens = hyphens
+
+        separators = r"\s"
+        self.dash_table = None
+        if hyphens == HYPHENS_SPLIT:
+            separators += DASHES
+            self.dash_table = str.maketrans(dict.fromkeys(DASH_CHARS, " "))
+        if mode == MARKDOWN:
+            # At least one letter or digit, so bare markup isn't a word.
+            pattern = f"[^{separators}]*[^\\W_][^{separators}]*"
+        else:
+            pattern = f"[^{separators}]+"
+        self.word_pattern = re.compile(pattern)
+
+    @property
+    def key(self):
+        """
+        Identifies the rule set in caches of word counts.
+        """
+        return f"{self.mode}:{self.hyphens}"
+
+    @property
+    def markdown(self):
+        return self.mode == MARKDOWN
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.key})"
+
+
+DEFAULT_RULES = CountRules()
+
+
+def get_rules(mode=None, hyphens=None):
+    """
+    Rule set for the `wordcount` and `hyphens` config values, None picks the default.
+    """
+    if mode is None and hyphens is None:
+        return DEFAULT_RULES
+    return CountRules(mode or PLAIN, hyphens or HYPHENS_JOIN)
+
+
+def count_words(text, rules=DEFAULT_RULES):
+    """
+    Count the words in `text`.
+    """
+    if not rules.markdown:
+        return _count_split(text, rules)
+    return _count_lines((match.group() for match in LINE.finditer(text)), rules)
+
+
+def count_file(path, rules=DEFAULT_RULES):
+    """
+    Count the words in the body of a scene/folder file without reading it into memory.
+
+    The header is everything up to the first blank line, like `Outline.reload_file` splits it.
+    """
+    if not rules.markdown:
+        return _count_split_file(path, rules)
+
+    import mmap
+
+    with open(path, "rb") as fp:
+        try:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file.
+            return 0
+        with mm:
+            profiling.count("read")
+            profiling.count("read_bytes", len(mm))
+            body_start = _body_start(mm)
+            if body_start is None:
+                return 0
+            mm.seek(body_start)
+            lines = (line.decode("utf8", "replace") for line in iter(mm.readline, b""))
+            return _count_lines(lines, rules)
+
+
+def _body_start(data):
+    """
+    Offset of the body in the raw file `data`, None if the file is only a header.
+    """
+    start = BODY_START.search(data)
+    if start is None:
+        return None
+    header_end = HEADER_END.search(data, start.start())
+    if header_end is None:
+        return None
+    return header_end.end()
+
+
+def _count_split_file(path, rules, chunk_size=CHUNK_SIZE):
+    profiling.count("read")
+    with open(path, "rb") as fp:
+        # The header is short, read until its end is in the buffer.
+        data = b""
+        body_start = None
+        while body_start is None:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                profiling.count("read_bytes", len(data))
+                return 0
+            data += chunk
+            body_start = _body_start(data)
+        profiling.count("read_bytes", len(data))
+
+        decoder = codecs.getincrementaldecoder("utf8")("replace")
+        count = 0
+        partial = ""
+        data = data[body_start:]
+        while True:
+            text = partial + decoder.decode(data)
+            if rules.dash_table is not None:
+                text = text.translate(rules.dash_table)
+            words = text.split()
+            partial = ""
+            if words and not text[-1].isspace():
+                # The last word may go on in the next chunk.
+                partial = words.pop()
+            count += len(words)
+            data = fp.read(chunk_size)
+            if not data:
+                break
+            profiling.count("read_bytes", len(data))
+    return count + _count_split(partial + decoder.decode(b"", final=True), rules)
+
+
+def _count_split(text, rules):
+    if rules.dash_table is not None:
+        text = text.translate(rules.dash_table)
+    return len(text.split())
+
+
+def _count_matches(pattern, text):
+    return sum(1 for _ in pattern.finditer(text))
+
+
+def _count_lines(lines, rules):
+    pattern = rules.word_pattern
+    count = 0
+    in_comment = False
+    for line in lines:
+        if rules.markdown:
+            if in_comment or COMMENT_START in line:
+                line, in_comment = _strip_comments(line, in_comment)
+            if HEADING.match(line):
+                continue
+        count += _count_matches(pattern, line)
+    return count
+
+
+def _strip_comments(line, in_comment):
+    """
+    Remove the html comments from `line`.  `in_comment` carries an open comment across lines.
+    """
+    parts = []
+    pos = 0
+    while True:
+        if in_comment:
+            end = line.find(COMMENT_END, pos)
+            if end < 0:
+                break
+            pos = end + len(COMMENT_END)
+            in_comment = False
+        else:
+            start = line.find(COMMENT_START, pos)
+            if start < 0:
+                parts.append(line[pos:])
+                break
+            parts.append(line[pos:start])
+            pos = start + len(COMMENT_START)
+            in_comment = True
+    return "".join(parts), in_comment
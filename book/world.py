@@ -0,0 +1,215 @@
+"""
+Keeps the world building tiddlers in sync with the tiddlywiki they come from.
+
+The wiki is fetched with conditional requests (ETag/Last-Modified) and hashed, so an unchanged
+wiki costs one 304 response and is never parsed or written again.  The validators and the
+hash are kept in `.book/tiddlywiki.json`.
+
+Tiddlers are stored one file per tiddler under `world/tiddlers/`, next to an `index.json` that
+maps each title to its file and content hash.  A sync only rewrites the tiddlers that changed.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+
+import book.fs_utils as fs_utils
+import book.manifest as manifest
+import tiddlywiki_parser
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = "tiddlywiki.json"
+TIDDLERS_DIR = "tiddlers"
+INDEX_FILENAME = "index.json"
+LEGACY_FILENAME = "tiddlers.json"  # the single file store used before the sharded one
+
+UNSAFE_CHARS = re.compile(r"[^\w.-]+")
+
+
+def fetch(source, state, timeout=30):
+    """
+    Fetch the raw wiki from `source`, a url or a local path.
+
+    Returns None when the wiki is unchanged since the fetch recorded in `state`, otherwise the
+    content as bytes.  `state` is updated in place with the new validators and hash.
+    """
+    if "://" not in source:
+        with open(source, "rb") as fp:
+            content = fp.read()
+    else:
+        request = urllib.request.Request(source)
+        if state.get("etag"):
+            request.add_header("If-None-Match", state["etag"])
+        if state.get("last_modified"):
+            request.add_header("If-Modified-Since", state["last_modified"])
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                content = response.read()
+                state["etag"] = response.headers.get("ETag")
+                state["last_modified"] = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304:
+                return None
+            raise
+
+    content_hash = hashlib.sha256(content).hexdigest()
+    if content_hash == state.get("hash"):
+        return None
+    state["hash"] = content_hash
+    return content
+
+
+def tiddler_filename(title):
+    """
+    A file name for the tiddler `title` that is safe on any filesystem.  The hash suffix keeps
+    titles apart that only differ in case or punctuation.
+    """
+    slug = UNSAFE_CHARS.sub("_", title).strip("_.")[:60]
+    digest = hashlib.sha1(title.encode("utf8")).hexdigest()[:8]
+    return f"{slug}-{digest}.json"
+
+
+def read_index(world_path):
+    try:
+        with open(os.path.join(world_path, TIDDLERS_DIR, INDEX_FILENAME)) as fp:
+            return json.load(fp)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def read_tiddler(world_path, title):
+    """
+    Read the single tiddler `title`.  Returns None if there is no such tiddler.
+    """
+    entry = read_index(world_path).get(title)
+    if entry is None:
+        return None
+    with open(os.path.join(world_path, TIDDLERS_DIR, entry["file"]), encoding="utf8") as fp:
+        return json.load(fp)
+
+
+def write_tiddlers(world_path, tiddlers):
+    """
+    Bring the tiddler store in `world_path` in line with `tiddlers`.  Only tiddlers whose
+    content changed are written and tiddlers that are gone are deleted.  Returns the number of
+    files written or deleted.
+    """
+    store_path = os.path.join(world_path, TIDDLERS_DIR)
+    os.makedirs(store_path, exist_ok=True)
+    old_index = read_index(world_path)
+    index = {}
+    changes = 0
+    for tiddler in tiddlers:
+        title = tiddler["title"]
+        text = json.dumps(tiddler, sort_keys=True, indent=4, separators=(",", ": "))
+        entry = {
+            "file": tiddler_filename(title),
+            "hash": hashlib.sha256(text.encode("utf8")).hexdigest(),
+        }
+        index[title] = entry
+        path = os.path.join(store_path, entry["file"])
+        if old_index.get(title) != entry or not os.path.exists(path):
+            fs_utils.write_atomic(path, text)
+            changes += 1
+
+    for title, entry in old_index.items():
+        if title not in index:
+            try:
+                os.remove(os.path.join(store_path, entry["file"]))
+            except FileNotFoundError:
+                pass
+            changes += 1
+
+    legacy_path = os.path.join(world_path, LEGACY_FILENAME)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+        changes += 1
+
+    if changes or index != old_index:
+        text = json.dumps(index, sort_keys=True, indent=4, separators=(",", ": "))
+        fs_utils.write_atomic(os.path.join(store_path, INDEX_FILENAME), text)
+    return changes
+
+
+class WorldSync(threading.Thread):
+    """
+    Syncs the tiddlywiki at `source` into the novel's world directory every `interval` seconds
+    from a background thread.
+
+    `pop_changed()` tells the caller whether any sync wrote files since it last asked.
+    """
+
+    INTERVAL = 600
+
+    def __init__(self, source, novel, interval=None):
+        super().__init__(name="book-world", daemon=True)
+        self.source = source
+        self.world_path = novel.world_building_path
+        self.state_path = os.path.join(manifest.get_book_dir(novel.path), STATE_FILENAME)
+        self.interval = self.INTERVAL if interval is None else interval
+        self.last_error = None
+        self._changed = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as fp:
+                return json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        fs_utils.write_atomic(self.state_path, json.dumps(state))
+
+    def sync(self):
+        """
+        Fetch the wiki once and write the tiddlers if it changed.  Returns True if files were
+        written.
+        """
+        state = self.load_state()
+        saved = dict(state)
+        content = fetch(self.source, state)
+        if content is None:
+            # New validators for the same content still have to be kept, or every later
+            # request sends the old ones and downloads the whole wiki again.
+            if state != saved:
+                self.save_state(state)
+            return False
+        wiki = tiddlywiki_parser.TiddlyWiki(content.decode("utf8"))
+        written = write_tiddlers(self.world_path, wiki.export_list()) > 0
+        # The hash is only saved once the tiddlers are on disk, so a failed write is retried.
+        self.save_state(state)
+        if written:
+            with self._lock:
+                self._changed = True
+        return written
+
+    def pop_changed(self):
+        """
+        Whether a sync wrote files since the last call.
+        """
+        with self._lock:
+            changed, self._changed = self._changed, False
+        return changed
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sync()
+                self.last_error = None
+            except Exception as exc:
+                # A bad wiki or a malformed tiddler must not take down the session.
+                self.last_error = exc
+                logger.warning("could not sync %s: %r", self.source, exc)
+            self._stop_event.wait(self.interval)
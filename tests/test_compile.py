@@ -1,5 +1,11 @@
+import argparse
 import os.path
+import random
 
+import pytest
+
+import book
+import book.compile
 import book.structure as struct
 
 
@@ -27,3 +33,168 @@ def test_metadata_level(novel):
 
     new_chapt1 = struct.Folder(os.path.join(path, "1-chapter1"))
     assert new_chapt1.level == 3
+
+
+def test_normalize_newlines_matches_clean_compile(novel):
+    rng = random.Random(3)
+    for _ in range(200):
+        fragments = [
+            "".join(rng.choice(["\n", "a", " "]) for _ in range(rng.randint(0, 8)))
+            for _ in range(rng.randint(0, 6))
+        ]
+        expected = novel.clean_compile("".join(fragments))
+        assert "".join(book.compile.normalize_newlines(fragments)) == expected
+
+
+def test_write_markdown(novel, tmp_path):
+    path = novel.outline.path
+    chapter = struct.Folder.create(os.path.join(path, "1-chapter1"))
+    chapter.rewrite(header=dict(chapter.header_dict, structure="chapter"), body="")
+    scene = struct.Scene.create(os.path.join(path, "1-chapter1", "1-scene1.md"))
+    scene.rewrite(body="\n\n\n\nfirst\n\n\n\nsecond\n\n\n")
+
+    md_filename = tmp_path / "single_file.md"
+    book.compile.write_markdown(md_filename, novel.iter_compile())
+    single_string = md_filename.read_text()
+    assert single_string == novel.compile()
+    assert "\n\n\n" not in single_string
+    assert "# chapter1\n\nfirst\n\nsecond" in single_string
+
+
+def test_incremental_compile(novel, tmp_path, monkeypatch):
+    path = novel.outline.path
+    scenes = []
+    for idx in range(3):
+        scene = struct.Scene.create(os.path.join(path, f"{idx}-scene{idx}.md"))
+        scene.rewrite(body=f"scene {idx}\n\n\n\nbody")
+        scenes.append(scene)
+
+    pandoc_runs = []
+
+    def fake_pandoc(src_md, targets, jobs=None):
+        results = []
+        for fmt, dst in targets.items():
+            pandoc_runs.append(dst)
+            with open(dst, "w") as fp:
+                fp.write(fmt)
+            results.append(book.compile.CompileResult(fmt, dst, 0, 0.0, dst + ".log"))
+        return results
+
+    cleaned = []
+    clean_fragment = book.compile.clean_fragment
+
+    def spy(fragment):
+        cleaned.append(fragment)
+        return clean_fragment(fragment)
+
+    monkeypatch.setattr(book.compile, "compile_formats", fake_pandoc)
+    monkeypatch.setattr(book.compile, "clean_fragment", spy)
+    build_dir = tmp_path / "build"
+    args = argparse.Namespace(
+        path=novel.path, build_dir=str(build_dir), formats="epub", jobs=None
+    )
+
+    book.show_compile(args)
+    assert len(pandoc_runs) == 1
+    assert (build_dir / "single_file.md").read_text() == novel.compile()
+
+    cleaned.clear()
+    book.show_compile(args)
+    assert len(pandoc_runs) == 1
+    assert cleaned == []
+
+    scenes[1].rewrite(body="changed")
+    book.show_compile(args)
+    assert len(pandoc_runs) == 2
+    assert len(cleaned) == 1
+    assert (build_dir / "single_file.md").read_text() == novel.compile()
+
+
+def test_compile_formats(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pandoc = bin_dir / "pandoc"
+    pandoc.write_text(
+        '#!/bin/sh\n'
+        'case "$2" in *.odt) echo "no odt" >&2; exit 3;; esac\n'
+        'echo "$@" > "$2"\n'
+    )
+    pandoc.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    src_md = tmp_path / "single_file.md"
+    src_md.write_text("# title\n")
+    targets = {fmt: str(tmp_path / f"book.{fmt}") for fmt in ("epub", "html", "odt")}
+    results = book.compile.compile_formats(str(src_md), targets)
+
+    assert [r.format for r in results] == ["epub", "html", "odt"]
+    assert [r.returncode for r in results] == [0, 0, 3]
+    assert "--epub-chapter-level" in (tmp_path / "book.epub").read_text()
+    assert "--standalone" in (tmp_path / "book.html").read_text()
+    assert "no odt" in (tmp_path / "book.odt.log").read_text()
+
+    with pytest.raises(ValueError):
+        book.compile.compile_formats(str(src_md), {"pdfx": str(tmp_path / "x")})
+
+
+def test_show_compile_fails_with_pandoc(novel, tmp_path, monkeypatch):
+    def fake_pandoc(src_md, targets, jobs=None):
+        return [
+            book.compile.CompileResult(fmt, dst, 0 if fmt == "epub" else 3, 0.0, dst + ".log")
+            for fmt, dst in targets.items()
+        ]
+
+    monkeypatch.setattr(book.compile, "compile_formats", fake_pandoc)
+    args = argparse.Namespace(
+        path=novel.path, build_dir=str(tmp_path / "build"), formats="epub", jobs=None
+    )
+    book.show_compile(args)
+
+    args.formats = "epub,odt"
+    with pytest.raises(SystemExit) as exc_info:
+        book.show_compile(args)
+    assert exc_info.value.code == 1
+
+    args.formats = "pdfx"
+    with pytest.raises(SystemExit):
+        book.show_compile(args)
+
+
+def test_build_markdown_streams_fragments(novel, tmp_path, monkeypatch):
+    path = novel.outline.path
+    for idx in range(3):
+        scene = struct.Scene.create(os.path.join(path, f"{idx}-scene{idx}.md"))
+        scene.rewrite(body=f"scene {idx}")
+    cache = book.compile.BuildCache(str(tmp_path))
+    iter_fragments = cache.iter_fragments
+    normalize_newlines = book.compile.normalize_newlines
+    read = []
+    written = []
+
+    def spy_read(hashes):
+        for fragment in iter_fragments(hashes):
+            read.append(fragment)
+            yield fragment
+
+    def spy_write(fragments):
+        for text in normalize_newlines(fragments):
+            written.append(len(read))
+            yield text
+
+    monkeypatch.setattr(cache, "iter_fragments", spy_read)
+    monkeypatch.setattr(book.compile, "normalize_newlines", spy_write)
+    monkeypatch.setattr(
+        book.compile, "clean_fragment", lambda text: "".join(normalize_newlines([text]))
+    )
+    md_filename = str(tmp_path / "single_file.md")
+    cache.build_markdown(
+        md_filename,
+        novel.compile_frontmatter(),
+        novel.snapshot().walk(),
+        novel.compile_backmatter(),
+    )
+    # Writing starts before the last fragment is read.
+    assert written[0] < len(read)
+    monkeypatch.undo()
+    with open(md_filename) as fp:
+        assert fp.read() == novel.compile()
@@ -0,0 +1,63 @@
+import argparse
+import os.path
+
+import pytest
+
+import book
+import book.structure as struct
+
+
+@pytest.fixture
+def scenes(novel):
+    path = novel.outline.path
+    struct.Folder.create(os.path.join(path, "1-chapter1"), ID=2)
+    struct.Scene.create(os.path.join(path, "1-chapter1", "1-scene1.md"), ID=3)
+    struct.Scene.create(os.path.join(path, "1-chapter1", "2-scene2.md"), ID=3)
+    return novel
+
+
+def test_lookup(scenes):
+    novel = struct.Novel(scenes.path)
+    chapter = os.path.join(novel.outline_path, "1-chapter1")
+    assert novel.lookup(1) == os.path.join(novel.outline_path, "novel.md")
+    assert novel.lookup(2) == os.path.join(chapter, "folder.txt")
+    assert novel.lookup(3) == os.path.join(chapter, "1-scene1.md")
+    assert novel.lookup(99) is None
+    assert novel.index.duplicates == {
+        3: [os.path.join(chapter, "1-scene1.md"), os.path.join(chapter, "2-scene2.md")]
+    }
+
+
+def test_show_find(scenes, capsys):
+    book.show_find(argparse.Namespace(path=scenes.path, ID=3))
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].endswith("1-scene1.md")
+    assert out[1] == "duplicate: " + os.path.join(
+        scenes.outline.path, "1-chapter1", "2-scene2.md"
+    )
+
+    with pytest.raises(SystemExit):
+        book.show_find(argparse.Namespace(path=scenes.path, ID=42))
+
+
+def test_lookup_reads_only_changed_headers(scenes, monkeypatch):
+    struct.Novel(scenes.path).index
+    chapter = os.path.join(scenes.outline.path, "1-chapter1")
+    struct.Scene.create(os.path.join(chapter, "3-scene3.md"), ID=9)
+
+    def fail(self):
+        raise AssertionError("tree load")
+
+    reads = []
+    reload_header = struct.Outline.reload_header
+
+    def spy(self, *args, **kwargs):
+        reads.append(self.file_path)
+        return reload_header(self, *args, **kwargs)
+
+    monkeypatch.setattr(struct.Outline, "load_tree", fail)
+    monkeypatch.setattr(struct.Outline, "reload_header", spy)
+    novel = struct.Novel(scenes.path)
+    assert novel.lookup(9) == os.path.join(chapter, "3-scene3.md")
+    assert reads == [os.path.join(chapter, "3-scene3.md")]
+    assert novel.index.duplicates[3][0] == os.path.join(chapter, "1-scene1.md")
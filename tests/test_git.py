@@ -0,0 +1,151 @@
+import os.path
+
+import git
+
+import book.git_utils as git_utils
+import book.session as sess
+import book.structure as struct
+
+
+def init_repo(path):
+    repo = git.Repo.init(path)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Test")
+        config.set_value("user", "email", "test@example.com")
+    repo.git.add("-A")
+    repo.git.commit("-m", "initial")
+    return repo
+
+
+def test_is_dirty_scoped_to_paths(novel):
+    os.makedirs(novel.world_building_path)
+    init_repo(novel.path)
+    scene = struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"))
+    with open(os.path.join(novel.path, "notes.txt"), "w") as fp:
+        fp.write("unrelated")
+
+    assert git_utils.is_dirty(novel.path, paths=[scene.file_path])
+    assert git_utils.is_dirty(novel.path, paths=[os.path.join(novel.path, "notes.txt")])
+    assert not git_utils.is_dirty(novel.path, paths=[novel.world_building_path])
+    assert not git_utils.is_dirty(novel.path, paths=[])
+
+
+def test_pathspec_maps_deleted_paths_to_parent(tmp_path):
+    gone = os.path.join(tmp_path, "gone", "scene.md")
+    assert git_utils.pathspec([gone, gone]) == [str(tmp_path)]
+
+
+def test_session_idle_commit_check_skips_git(novel, monkeypatch):
+    init_repo(novel.path)
+    session = sess.Session(struct.Novel(novel.path), 100, None)
+    session.last_commit = 0
+
+    # Nothing uncommitted at startup: one scoped status, then nothing is left to check.
+    assert not session.is_dirty
+
+    def fail(*args, **kwargs):
+        raise AssertionError("git was called while idle")
+
+    monkeypatch.setattr(git_utils, "is_dirty", fail)
+    session.refresh()
+    session.commit()
+    monkeypatch.undo()
+
+    scene = struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"))
+    scene.rewrite(body="some words")
+    session.refresh()
+    assert session.is_dirty
+
+    session.do_commit()
+    assert not session._touched
+    assert not session.repo.is_dirty(untracked_files=True)
+
+
+def test_push_worker_pushes_to_bare_remote(novel, tmp_path_factory):
+    repo = init_repo(novel.path)
+    remote = tmp_path_factory.mktemp("remote")
+    git.Repo.init(remote, bare=True)
+    repo.create_remote("origin", str(remote))
+    repo.git.push("-u", "origin", repo.active_branch.name)
+
+    session = sess.Session(struct.Novel(novel.path), 100, None)
+    try:
+        assert session.pusher is not None
+        struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"))
+        session.refresh()
+        session.do_commit()
+        assert session.pusher.flush(timeout=30)
+        assert session.push_status == "pushed"
+        assert git.Repo(remote).head.commit.hexsha == repo.head.commit.hexsha
+    finally:
+        session.close()
+
+
+def test_push_worker_backs_off_and_coalesces(novel, tmp_path_factory):
+    repo = init_repo(novel.path)
+    remote = tmp_path_factory.mktemp("remote") / "missing.git"
+    repo.create_remote("origin", str(remote))
+
+    worker = git_utils.PushWorker(novel.path)
+    worker.INITIAL_BACKOFF = 0.05
+    worker.start()
+    try:
+        worker.request()
+        worker.request()
+        assert not worker.flush(timeout=0.5)
+        assert worker.failures >= 2
+        assert worker.pending == 2
+        assert worker.status.startswith("push failed")
+
+        git.Repo.init(remote, bare=True)
+        repo.git.config("push.default", "current")
+        assert worker.flush(timeout=30)
+        assert worker.failures == 0
+        assert worker.status == "pushed"
+    finally:
+        worker.stop()
+
+
+def test_commit_stages_touched_paths_in_one_add(novel, monkeypatch):
+    repo = init_repo(novel.path)
+    session = sess.Session(struct.Novel(novel.path), 100, None)
+    session._touched.clear()
+
+    folder = struct.Folder.create(os.path.join(novel.outline_path, "1-part"))
+    for idx in range(20):
+        struct.Scene.create(os.path.join(folder.path, f"{idx}-scene.md"))
+    with open(os.path.join(novel.path, "notes.txt"), "w") as fp:
+        fp.write("not part of the outline")
+    session.refresh()
+
+    commands = []
+    execute = git.cmd.Git.execute
+
+    def spy(self, command, *args, **kwargs):
+        commands.append(command[1])
+        return execute(self, command, *args, **kwargs)
+
+    monkeypatch.setattr(git.cmd.Git, "execute", spy)
+    session.do_commit()
+    monkeypatch.undo()
+
+    assert commands.count("add") == 1
+    assert commands.count("commit") == 1
+    assert repo.untracked_files == ["notes.txt"]
+
+    # Renaming the folder is picked up through the parent of the deleted paths.
+    os.rename(folder.path, os.path.join(novel.outline_path, "2-part"))
+    session.refresh()
+    session.do_commit()
+    assert not repo.is_dirty()
+    assert repo.untracked_files == ["notes.txt"]
+
+
+def test_pathspec_drops_nested_paths(tmp_path):
+    nested = tmp_path / "a" / "b"
+    nested.mkdir(parents=True)
+    (tmp_path / "ab").mkdir()
+    assert git_utils.pathspec([nested, tmp_path / "a", tmp_path / "ab"]) == [
+        str(tmp_path / "a"),
+        str(tmp_path / "ab"),
+    ]
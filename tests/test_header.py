@@ -0,0 +1,34 @@
+import pytest
+
+import book.structure as struct
+
+CONTENTS = [
+    "title:  one\nID:  3\n\nbody\n\nmore",
+    "\n\n  title:  leading\nID:  3\n\nbody",
+    "title:  multi\nsummary:  line one\n           line two\n\nbody",
+    "title:  trailing  \n\nbody",
+    "title:  only a header\n",
+    "title:  spaces line\n   \n\nbody",
+    "ID: 3\n\t\n\n",
+    "title: x\n   \n\n",
+    "title: x\n\n  \n\t\n",
+    "",
+]
+
+
+@pytest.mark.parametrize("content", CONTENTS)
+def test_header_only_read_matches_full_read(tmp_path, content):
+    path = tmp_path / "outline" / "1-scene.md"
+    path.parent.mkdir()
+    path.write_text(content)
+
+    full = struct.Scene(str(path))
+    full.reload_file()
+    header_only = struct.Scene(str(path))
+    header_only.reload_header()
+
+    assert header_only._raw_header == full._raw_header
+    assert header_only.header_dict == full.header_dict
+    assert header_only._body is None
+    assert header_only.body == full.body
+    assert header_only.count == full.count
@@ -0,0 +1,75 @@
+import json
+import multiprocessing
+import os.path
+
+import book
+import book.ids as ids
+import book.structure as struct
+
+
+def allocate_many(path, count, queue):
+    novel = struct.Novel(path)
+    queue.put([novel.ids.allocate() for _ in range(count)])
+
+
+def test_allocate_scans_once(novel, monkeypatch):
+    struct.Scene.create(os.path.join(novel.outline.path, "1-scene1.md"), ID=7)
+    novel = struct.Novel(novel.path)
+    assert novel.ids.allocate() == 8
+
+    def fail():
+        raise AssertionError("full scan")
+
+    monkeypatch.setattr(novel.ids, "scan", fail)
+    assert novel.ids.allocate() == 9
+
+
+def test_stale_state_rescans(novel):
+    struct.Scene.create(os.path.join(novel.outline.path, "1-scene1.md"), ID=7)
+    novel = struct.Novel(novel.path)
+    novel.load()
+    novel.ids.allocate()
+    with open(novel.ids.path, "w") as fp:
+        json.dump({"high": 2}, fp)
+    assert novel.ids.allocate() == 8
+
+
+def test_stale_manifest_rescans(novel):
+    struct.Scene.create(os.path.join(novel.outline.path, "1-scene1.md"), ID=7)
+    novel = struct.Novel(novel.path)
+    assert novel.ids.allocate() == 8
+    # A scene added behind the manifest's back (git pull, by hand) with a higher ID.
+    struct.Scene.create(os.path.join(novel.outline.path, "2-scene2.md"), ID=20)
+    novel = struct.Novel(novel.path)
+    assert novel.ids.allocate() == 21
+
+
+def test_bulk_new_scans_once(novel, monkeypatch):
+    scans = []
+    scan = ids.IdAllocator.scan
+
+    def spy(self):
+        scans.append(1)
+        return scan(self)
+
+    monkeypatch.setattr(ids.IdAllocator, "scan", spy)
+    for idx in range(10):
+        book.new_scene(novel.path, os.path.join(novel.outline.path, f"{idx}-scene.md"), False)
+    assert len(scans) == 1
+    assert struct.Novel(novel.path).load().max_pk == 11
+
+
+def test_concurrent_allocations_are_unique(novel):
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=allocate_many, args=(str(novel.path), 10, queue))
+        for _ in range(4)
+    ]
+    for proc in procs:
+        proc.start()
+    allocated = []
+    for _ in procs:
+        allocated += queue.get(timeout=30)
+    for proc in procs:
+        proc.join()
+    assert sorted(allocated) == list(range(2, 42))
@@ -0,0 +1,82 @@
+import json
+import logging
+import os.path
+import subprocess
+import sys
+
+import book.structure as struct
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, sys
+import book
+sys.argv = ["book", "stats", sys.argv[1]]
+book.main()
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def run_stats(path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(path)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_stats_skips_heavy_imports(novel):
+    struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"))
+    modules = run_stats(novel.path)
+    assert "book.structure" in modules
+    for name in ("git", "book.session", "tiddlywiki_parser", "prompter", "yaml", "socketserver"):
+        assert name not in modules, name
+
+
+def test_import_book_skips_subcommand_modules():
+    script = "import json, sys, book; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True,
+    )
+    modules = set(json.loads(result.stdout))
+    for name in ("book.library", "book.serve", "socketserver", "concurrent.futures", "csv"):
+        assert name not in modules, name
+
+
+def test_import_book_exposes_structure():
+    script = "import book; print(book.struct.Novel.__name__, book.structure.Outline.__name__)"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True,
+    )
+    assert result.stdout.split() == ["Novel", "Outline"]
+    assert result.stderr == ""
+
+
+def test_verbose_turns_on_debug_logging(novel):
+    script = """
+import logging, sys
+import book
+sys.argv = ["book", "--verbose", "stats", sys.argv[1]]
+book.main()
+print(logging.getLogger().level)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(novel.path)],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True,
+    )
+    assert result.stdout.splitlines()[-1] == str(logging.DEBUG)
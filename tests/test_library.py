@@ -0,0 +1,87 @@
+import json
+import os.path
+import subprocess
+import sys
+
+import book.library as library
+import book.structure as struct
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_library(tmp_path):
+    for name in ("a", "b"):
+        novel = struct.Novel.create(tmp_path / "shelf" / name, convert=True)
+        scene = struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"))
+        scene.rewrite(body="three -- words")
+    # An anchor without an outline fails on its own without taking the others down.
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / struct.Novel.ANCHOR).write_text("1\n")
+    # Hidden directories are not searched.
+    (tmp_path / ".trash" / "c").mkdir(parents=True)
+    (tmp_path / ".trash" / "c" / struct.Novel.ANCHOR).write_text("1\n")
+
+
+def test_discover(tmp_path):
+    make_library(tmp_path)
+    assert library.discover(tmp_path) == [
+        str(tmp_path / "broken"),
+        str(tmp_path / "shelf" / "a"),
+        str(tmp_path / "shelf" / "b"),
+    ]
+
+
+def test_stats_isolates_failures(tmp_path):
+    make_library(tmp_path)
+    results = library.run(library.discover(tmp_path), library.STATS, jobs=2)
+    assert [result.ok for result in results] == [False, True, True]
+    assert "FileNotFoundError" in results[0].error
+    assert results[1].result["count"] == 3
+
+    summary = library.totals(results)
+    assert summary["novels"] == 3
+    assert summary["failed"] == 1
+    assert summary["count"] == 6
+    assert summary["scenes"] == 2
+
+
+def test_transform_and_compile(tmp_path):
+    make_library(tmp_path)
+    paths = library.discover(tmp_path / "shelf")
+    results = library.run(
+        paths, library.TRANSFORM, {"transforms": ["em-dashes"], "dry_run": True}
+    )
+    assert all(result.ok for result in results)
+    assert results[0].result == {"files": 1, "counts": {"em-dashes": 1}}
+
+    # No formats: only the markdown is built, pandoc isn't needed.
+    results = library.run(paths, library.COMPILE, {"formats": []})
+    assert all(result.ok for result in results)
+    assert os.path.exists(os.path.join(paths[0], "build", "single_file.md"))
+
+
+def test_compile_json_report(tmp_path):
+    make_library(tmp_path)
+    script = "import sys, book; sys.argv = ['book'] + sys.argv[1:]; book.main()"
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            script,
+            "library",
+            "--run",
+            "compile",
+            "--format",
+            "json",
+            "--formats",
+            "",
+            str(tmp_path / "shelf"),
+        ],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout)
+    assert report["totals"] == {"novels": 2, "failed": 0}
+    assert all(novel["ok"] for novel in report["novels"])
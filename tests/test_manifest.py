@@ -0,0 +1,85 @@
+import os.path
+
+import book.session as sess
+import book.structure as struct
+
+
+def make_scenes(novel):
+    path = novel.outline.path
+    struct.Folder.create(os.path.join(path, "1-chapter1"), ID=2)
+    for idx in range(3):
+        scene = struct.Scene.create(
+            os.path.join(path, "1-chapter1", f"{idx}-scene{idx}.md"), ID=idx + 3
+        )
+        scene.rewrite(body=f"scene {idx} has some words")
+
+
+def count_reads(monkeypatch):
+    reads = []
+    for name in ("reload_file", "reload_header"):
+        monkeypatch.setattr(struct.Outline, name, spy(reads, getattr(struct.Outline, name)))
+    return reads
+
+
+def spy(reads, method):
+    def wrapper(self, *args, **kwargs):
+        reads.append(self.file_path)
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def test_manifest_skips_unchanged_files(novel, monkeypatch):
+    make_scenes(novel)
+    first = struct.Novel(novel.path).load()
+    assert os.path.exists(os.path.join(novel.path, ".book", "manifest"))
+
+    reads = count_reads(monkeypatch)
+    outline = struct.Novel(novel.path).load()
+    assert reads == []
+    assert outline.count == first.count == 15
+    assert outline.max_pk == 5
+    assert reads == []
+
+
+def test_manifest_rereads_changed_files(novel, monkeypatch):
+    make_scenes(novel)
+    struct.Novel(novel.path).load()
+
+    scene_path = os.path.join(novel.outline.path, "1-chapter1", "1-scene1.md")
+    scene = struct.Scene(scene_path)
+    scene.rewrite(body="only three words")
+
+    reads = count_reads(monkeypatch)
+    outline = struct.Novel(novel.path).load()
+    assert reads == [scene_path]
+    assert outline.count == 13
+
+
+def test_manifest_drops_deleted_files(novel):
+    make_scenes(novel)
+    struct.Novel(novel.path).load()
+    manifest = struct.Novel(novel.path).manifest
+    chapter = os.path.join(novel.outline.path, "1-chapter1")
+    os.rename(os.path.join(chapter, "1-scene1.md"), os.path.join(chapter, "5-moved.md"))
+    os.remove(os.path.join(chapter, "2-scene2.md"))
+
+    struct.Novel(novel.path).load()
+    manifest.load()
+    assert sorted(manifest.entries) == [
+        "outline/1-chapter1/0-scene0.md",
+        "outline/1-chapter1/5-moved.md",
+        "outline/1-chapter1/folder.txt",
+        "outline/novel.md",
+    ]
+
+    os.remove(os.path.join(chapter, "5-moved.md"))
+    session = sess.Session(struct.Novel(novel.path), 1000, None)
+    session.close()
+    manifest.load()
+    assert "outline/1-chapter1/5-moved.md" not in manifest.entries
+
+    os.remove(os.path.join(chapter, "0-scene0.md"))
+    struct.Novel(novel.path).ids.allocate()
+    manifest.load()
+    assert sorted(manifest.entries) == ["outline/1-chapter1/folder.txt", "outline/novel.md"]
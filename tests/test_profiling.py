@@ -0,0 +1,55 @@
+import os.path
+
+import pytest
+
+import book.profiling as profiling
+import book.structure as struct
+
+
+@pytest.fixture
+def profile():
+    profiling.reset()
+    profiling.enable()
+    yield profiling
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled_by_default():
+    profiling.reset()
+    profiling.count("read")
+    with profiling.timer("git"):
+        pass
+    assert not profiling.counters
+    assert not profiling.timers
+
+
+def test_stats_walk_counters(novel, profile):
+    for idx in range(3):
+        struct.Scene.create(os.path.join(novel.outline_path, f"{idx}-scene.md"))
+
+    struct.Novel(novel.path).snapshot()
+    cold = dict(profile.counters)
+    assert cold["listdir"] == 1
+    assert cold["stat"] == 4
+    assert cold["read"] >= 4
+    assert cold["parse"] == 4
+    assert "parse" in profile.timers
+
+    profile.reset()
+    struct.Novel(novel.path).snapshot()
+    # The manifest answers the second walk without reading or parsing.
+    assert profile.counters["stat"] == 4
+    assert "parse" not in profile.counters
+
+
+def test_summary_and_out_file(tmp_path, profile):
+    profile.count("read", 2)
+    with profile.timer("git"):
+        pass
+    out = tmp_path / "profile.txt"
+    profile.stop(out=str(out))
+    assert not profile.is_enabled()
+    text = out.read_text()
+    assert "read" in text
+    assert "git" in text
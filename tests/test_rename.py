@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import book.rename as rename
+import book.structure as struct
+
+
+@pytest.fixture
+def outline(novel):
+    path = novel.outline.path
+    struct.Scene.create(os.path.join(path, "0-bar.md"), ID=2)
+    struct.Scene.create(os.path.join(path, "1-foo.md"), ID=3)
+    struct.Scene.create(os.path.join(path, "0.5-foo.md"), ID=4)
+    struct.Folder.create(os.path.join(path, "4-chapter"), ID=5)
+    struct.Scene.create(os.path.join(path, "4-chapter", "5-inner.md"), ID=6)
+    return struct.Outline(novel.outline.path)
+
+
+def listing(path):
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, name), path)
+        for dirpath, dirnames, filenames in os.walk(path)
+        for name in dirnames + filenames
+    )
+
+
+def test_plan_and_apply(outline):
+    rename_plan = rename.plan(outline)
+    path = outline.path
+    changes = [
+        (os.path.relpath(old, path), os.path.relpath(new, path))
+        for old, new in rename_plan.changes
+    ]
+    assert changes == [
+        ("0.5-foo.md", "1-foo.md"),
+        ("1-foo.md", "2-foo.md"),
+        ("4-chapter", "3-chapter"),
+        (os.path.join("4-chapter", "5-inner.md"), os.path.join("4-chapter", "0-inner.md")),
+    ]
+
+    rename.apply(rename_plan)
+    assert listing(path) == [
+        "0-bar.md",
+        "1-foo.md",
+        "2-foo.md",
+        "3-chapter",
+        os.path.join("3-chapter", "0-inner.md"),
+        os.path.join("3-chapter", "folder.txt"),
+        "novel.md",
+    ]
+    assert struct.Scene(os.path.join(path, "1-foo.md")).pk == 4
+    assert struct.Scene(os.path.join(path, "2-foo.md")).pk == 3
+
+
+def test_failed_apply_rolls_back(outline, monkeypatch):
+    path = outline.path
+    before = listing(path)
+    rename_plan = rename.plan(outline)
+
+    calls = []
+    real_rename = os.rename
+
+    def flaky_rename(src, dst):
+        calls.append(src)
+        if len(calls) == 4:
+            raise PermissionError("nope")
+        real_rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", flaky_rename)
+    with pytest.raises(rename.RenameError):
+        rename.apply(rename_plan)
+    monkeypatch.undo()
+    assert listing(path) == before
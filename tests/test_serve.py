@@ -0,0 +1,146 @@
+import argparse
+import os.path
+import socket
+import threading
+import time
+
+import pytest
+
+import book
+import book.serve as serve
+import book.structure as struct
+import book.watcher as watcher
+
+
+@pytest.fixture
+def server(novel):
+    scene = struct.Scene.create(os.path.join(novel.outline_path, "1-scene.md"), ID=2)
+    scene.rewrite(body="one two three")
+    novel = struct.Novel(novel.path)
+    server = serve.Server(novel, watcher.get_watcher(novel.outline_path))
+    thread = threading.Thread(target=server.run, kwargs={"timeout": 0.1}, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(server.socket_path):
+            break
+        time.sleep(0.01)
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def wait_for(fx, expected, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = fx()
+        if value == expected:
+            return value
+        time.sleep(0.02)
+    return fx()
+
+
+def test_no_daemon(novel):
+    assert serve.request(novel.path, "count") is None
+
+
+def test_stale_socket_is_ignored(novel):
+    path = serve.socket_path(novel.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+    assert serve.request(novel.path, "count") is None
+
+
+def test_queries(server, novel):
+    assert serve.request(novel.path, "count") == {"ok": True, "result": 3}
+    reply = serve.request(novel.path, "find", {"ID": 2})
+    assert reply["result"]["path"].endswith("1-scene.md")
+    reply = serve.request(novel.path, "stats", {"format": "text", "folder": False})
+    assert "count = 3" in reply["result"]
+    reply = serve.request(novel.path, "bogus")
+    assert not reply["ok"]
+
+
+def test_refreshes_on_change(server, novel):
+    scene_path = os.path.join(novel.outline_path, "1-scene.md")
+    with open(scene_path, "a") as fp:
+        fp.write(" four five\n")
+
+    def count():
+        return serve.request(novel.path, "count")["result"]
+
+    assert wait_for(count, 5) == 5
+
+
+def test_answers_see_a_save_at_once(server, novel):
+    assert server.live
+    scene_path = os.path.join(novel.outline_path, "1-scene.md")
+    for words in range(4, 9):
+        with open(scene_path, "a") as fp:
+            fp.write(" more")
+        assert serve.request(novel.path, "count")["result"] == words
+
+    new_path = os.path.join(novel.outline_path, "2-new.md")
+    struct.Scene.create(new_path, ID=50)
+    assert serve.request(novel.path, "find", {"ID": 50})["result"]["path"] == new_path
+
+
+def test_new_through_daemon(server, novel):
+    path = os.path.join(novel.outline_path, "2-Another.md")
+    reply = serve.request(novel.path, "new", {"path": path})
+    assert reply["ok"]
+    assert reply["result"]["kind"] == "scene"
+    assert os.path.exists(path)
+    ID = reply["result"]["ID"]
+    assert serve.request(novel.path, "find", {"ID": ID})["result"]["path"] == path
+
+    reply = serve.request(novel.path, "new", {"path": path})
+    assert not reply["ok"]
+
+
+def test_cli_uses_daemon(server, novel, capsys, monkeypatch):
+    args = argparse.Namespace(path=novel.path, no_serve=False)
+    monkeypatch.setattr(struct, "get_novel", None)  # the daemon must answer
+    book.show_count(args)
+    assert capsys.readouterr().out == "3\n"
+
+
+def test_stop_removes_socket(server):
+    server.stop()
+    for _ in range(100):
+        if not os.path.exists(server.socket_path):
+            break
+        time.sleep(0.02)
+    assert not os.path.exists(server.socket_path)
+
+
+def test_unexpected_error_is_replied(server, novel, monkeypatch):
+    def fail():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(server.novel.ids, "allocate", fail)
+    path = os.path.join(novel.outline_path, "2-Another.md")
+    reply = serve.request(novel.path, "new", {"path": path})
+    assert reply == {"ok": False, "error": "new failed: disk full"}
+    assert not os.path.exists(path)
+
+
+def test_broken_reply_is_an_error(novel):
+    path = serve.socket_path(novel.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(path)
+        listener.listen(1)
+
+        def answer():
+            conn, _ = listener.accept()
+            with conn:
+                conn.recv(1024)
+                conn.sendall(b'{"ok": tr')
+
+        thread = threading.Thread(target=answer)
+        thread.start()
+        reply = serve.request(novel.path, "count")
+        thread.join(5)
+    assert not reply["ok"]
+    assert "No answer" in reply["error"]
@@ -0,0 +1,46 @@
+import os.path
+
+import book.session as sess
+import book.structure as struct
+import book.watcher
+
+
+def test_session_recounts_only_changed_scenes(novel, monkeypatch):
+    path = novel.outline.path
+    scenes = []
+    for idx in range(3):
+        scene = struct.Scene.create(os.path.join(path, f"{idx}-scene{idx}.md"))
+        scene.rewrite(body="two words")
+        scenes.append(scene)
+
+    session = sess.Session(struct.Novel(novel.path), 100, None)
+    assert session.start == 6
+    assert session.count == 0
+
+    reads = []
+    reload_header = struct.Outline.reload_header
+
+    def spy(self, *args, **kwargs):
+        reads.append(self.file_path)
+        return reload_header(self, *args, **kwargs)
+
+    monkeypatch.setattr(struct.Outline, "reload_header", spy)
+
+    session.refresh()
+    assert not session.is_changed
+    assert reads == []
+
+    scenes[1].rewrite(body="now there are five words")
+    session.refresh()
+    assert session.is_changed
+    assert reads == [scenes[1].file_path]
+    assert session.count == 3
+    assert session.total_count == 9
+
+
+def test_close_closes_watcher(novel):
+    watcher = book.watcher.get_watcher(novel.outline_path)
+    session = sess.Session(struct.Novel(novel.path), 100, None, watcher=watcher)
+    session.close()
+    if isinstance(watcher, book.watcher.InotifyWatcher):
+        assert watcher.fd == -1
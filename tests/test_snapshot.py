@@ -0,0 +1,59 @@
+import os.path
+
+import pytest
+
+import book.metadata as mdata
+import book.structure as struct
+
+
+@pytest.fixture
+def tree(novel):
+    path = novel.outline.path
+    chapter1 = struct.Folder.create(os.path.join(path, "1-chapter1"), ID=2)
+    header = chapter1.header_dict
+    header[mdata.STRUCTURE] = mdata.CHAPTER
+    chapter1.rewrite(header=header, body="")
+    scene = struct.Scene.create(os.path.join(path, "1-chapter1", "1-scene1.md"), ID=3)
+    scene.rewrite(body="one two three")
+    struct.Folder.create(os.path.join(path, "2-chapter2"), ID=4)
+    struct.Folder.create(os.path.join(path, "2-chapter2", "1-part"), ID=9)
+    scene = struct.Scene.create(
+        os.path.join(path, "2-chapter2", "1-part", "1-scene2.md"), ID=5
+    )
+    scene.rewrite(body="four five")
+    struct.Scene.create(os.path.join(path, "2-scene3.md"), ID=6)
+    return struct.Novel(novel.path)
+
+
+def test_snapshot_matches_outline(tree):
+    outline = struct.Novel(tree.path).outline
+    root = tree.snapshot()
+
+    assert [n.path for n in root.folders()] == [
+        f.path for f in outline.folders(recursive=True)
+    ]
+    assert [n.path for n in root.scenes()] == [
+        s.path for s in outline.scenes(recursive=True)
+    ]
+    assert [n.count for n in root.scenes()] == [
+        s.count for s in outline.scenes(recursive=True)
+    ]
+    assert root.count == outline.count == 5
+    assert root.max_pk == outline.max_pk == 9
+    assert root.scene_count == 3
+    assert root.total_bytes == sum(os.path.getsize(n.file_path) for n in root.walk())
+    chapter2 = root.children[1]
+    assert (chapter2.total_words, chapter2.scene_count, chapter2.max_pk) == (2, 1, 9)
+
+
+def test_snapshot_compile(tree):
+    outline = struct.Novel(tree.path).outline
+    assert tree.snapshot().compile_string() == outline.compile_string()
+    assert "# chapter1" in tree.compile()
+
+
+def test_snapshot_is_frozen(tree):
+    root = tree.snapshot()
+    with pytest.raises(AttributeError):
+        root.total_words = 0
+    assert not hasattr(root, "__dict__")
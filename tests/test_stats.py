@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+import os.path
+
+import book.stats as stats
+import book.structure as struct
+
+
+def make_novel(novel):
+    part = struct.Folder.create(os.path.join(novel.outline_path, "1-part"))
+    scene = struct.Scene.create(os.path.join(part.path, "1-first.md"))
+    scene.rewrite(body="one two three")
+    scene = struct.Scene.create(os.path.join(novel.outline_path, "2-second.md"))
+    scene.rewrite(body="four five")
+    return struct.Novel(novel.path).snapshot()
+
+
+def test_text_sheet(novel):
+    root = make_novel(novel)
+    out = io.StringIO()
+    stats.render(root, out=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].endswith("first")
+    assert lines[2] == "count = 5"
+    # The text sheet keeps its original lines for scripts that parse it; bytes are csv/json only.
+    assert lines[3:] == [f"max pk = {root.max_pk}"]
+
+
+def test_csv_sheet_has_folder_subtotals(novel):
+    root = make_novel(novel)
+    out = io.StringIO()
+    stats.render(root, stats.CSV, out=out)
+    sheet = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [row["kind"] for row in sheet] == ["novel", "folder", "scene", "scene"]
+    assert sheet[0]["words"] == "5"
+    assert sheet[1]["words"] == "3"
+    assert sheet[1]["path"] == "1-part"
+    assert sheet[2]["depth"] == "2"
+    assert sheet[2]["path"] == os.path.join("1-part", "1-first.md")
+    assert int(sheet[1]["bytes"]) == int(sheet[2]["bytes"]) + os.path.getsize(
+        os.path.join(novel.outline_path, "1-part", "folder.txt")
+    )
+
+
+def test_json_sheet(novel):
+    root = make_novel(novel)
+    out = io.StringIO()
+    stats.render(root, stats.JSON, folders=True, out=out)
+    sheet = json.loads(out.getvalue())
+    assert sheet["count"] == 5
+    assert sheet["scenes"] == 2
+    assert [node["kind"] for node in sheet["nodes"]] == ["folder"]
+    assert sheet["nodes"][0]["scenes"] == 1
@@ -2,6 +2,7 @@ import argparse
 import os
 
 import book
+import book.transform as transform
 
 
 def test_softcrlf_multiline_meta(novel):
@@ -22,3 +23,63 @@ def test_softcrlf_multiline_meta(novel):
     assert scene.header_dict['test'] == 'some text\n\nThe next line of text'
     # These leading three \n's shouldn't be here, not sure where they come from.
     assert scene.body == '\n\n\np1\n\np2'
+
+
+def test_text_transforms():
+    assert transform.smart_quotes('"Hi," she said. \'It\'s (\'fine\')."') == (
+        "“Hi,” she said. ‘It’s (‘fine’).”",
+        7,
+    )
+    assert transform.em_dashes("wait--no\n---\n") == ("wait—no\n---\n", 1)
+    assert transform.trailing_whitespace("a  \nb\t\nc") == ("a\nb\nc", 2)
+
+
+def test_chained_dry_run_and_apply(novel, capsys):
+    path = novel.outline.path
+    changed_path = os.path.join(path, "1-changed.md")
+    clean_path = os.path.join(path, "2-clean.md")
+    book.new_scene(novel.path, changed_path, convert=False)
+    book.new_scene(novel.path, clean_path, convert=False)
+    book.structure.Scene(changed_path).rewrite(body="wait--no  \nyes")
+    book.structure.Scene(clean_path).rewrite(body="nothing to do")
+    clean_mtime = os.stat(clean_path).st_mtime_ns
+    capsys.readouterr()
+
+    args = argparse.Namespace(
+        softcrlf=False,
+        hardcrlf=False,
+        path=novel.path,
+        transforms=["em-dashes", "trailing-whitespace"],
+        dry_run=True,
+        jobs=2,
+    )
+    book.show_transform(args)
+    out = capsys.readouterr().out
+    assert f"would change {changed_path}: em-dashes=1, trailing-whitespace=1" in out
+    assert clean_path not in out
+    assert book.structure.Scene(changed_path).body.strip() == "wait--no  \nyes"
+
+    args.dry_run = False
+    book.show_transform(args)
+    assert book.structure.Scene(changed_path).body.strip() == "wait—no\nyes"
+    assert os.stat(clean_path).st_mtime_ns == clean_mtime
+
+
+def test_hardcrlf_dry_run_on_hard_crlf_file(novel, capsys):
+    scene_path = os.path.join(novel.outline.path, "1-hard.md")
+    book.new_scene(novel.path, scene_path, convert=False)
+    book.structure.Scene(scene_path).rewrite(body="p1\np2\np3\n")
+    mtime = os.stat(scene_path).st_mtime_ns
+    capsys.readouterr()
+
+    args = argparse.Namespace(
+        softcrlf=False, hardcrlf=True, path=novel.path, transforms=[], dry_run=True
+    )
+    book.show_transform(args)
+    assert scene_path not in capsys.readouterr().out
+
+    args.dry_run = False
+    book.show_transform(args)
+    assert scene_path not in capsys.readouterr().out
+    assert os.stat(scene_path).st_mtime_ns == mtime
+    assert transform.hard_crlf("a\n\n\nb\nc") == ("a\nb\nc", 1)
@@ -0,0 +1,43 @@
+import os.path
+
+import book.structure as struct
+
+
+def build_tree(novel):
+    path = novel.outline.path
+    struct.Folder.create(os.path.join(path, "1-chapter1"))
+    struct.Scene.create(os.path.join(path, "1-chapter1", "1-scene1.md"))
+    struct.Scene.create(os.path.join(path, "1-chapter1", "2-scene2.md"))
+    struct.Folder.create(os.path.join(path, "2-chapter2"))
+    struct.Folder.create(os.path.join(path, "2-chapter2", "1-part1"))
+    struct.Scene.create(os.path.join(path, "2-chapter2", "1-part1", "1-scene3.md"))
+    struct.Scene.create(os.path.join(path, "0-prologue.md"))
+    os.makedirs(os.path.join(path, "notes"))
+    with open(os.path.join(path, "2-chapter2", "todo.org"), "w") as fp:
+        fp.write("todo")
+
+
+def names(nodes):
+    return [node.path if hasattr(node, "path") else node for node in nodes]
+
+
+def test_load_tree_matches_lazy_walk(novel, monkeypatch):
+    build_tree(novel)
+    lazy = struct.Outline(novel.outline_path)
+    loaded = struct.Outline(novel.outline_path)
+
+    def fail(path):
+        raise AssertionError(f"unexpected stat of {path}")
+
+    monkeypatch.setattr(os.path, "isfile", fail)
+    loaded.load_tree()
+    monkeypatch.undo()
+
+    assert names(loaded.folders(recursive=True)) == names(lazy.folders(recursive=True))
+    assert names(loaded.scenes(recursive=True)) == names(lazy.scenes(recursive=True))
+    assert sorted(map(str, names(loaded.other_files()))) == sorted(
+        map(str, names(lazy.other_files()))
+    )
+    chapter2 = loaded.folders()[1]
+    assert os.path.join(chapter2.path, "todo.org") in chapter2.other_files()
+    assert loaded.count == lazy.count
@@ -0,0 +1,50 @@
+import os.path
+
+import pytest
+
+import book.session as sess
+import book.structure as struct
+import book.watcher as watcher
+
+
+@pytest.fixture
+def inotify(novel):
+    try:
+        inotify = watcher.InotifyWatcher(novel.outline.path)
+    except (OSError, AttributeError):
+        pytest.skip("inotify not available")
+    yield inotify
+    inotify.close()
+
+
+def test_reports_saved_scene(novel, inotify):
+    scene = struct.Scene.create(os.path.join(novel.outline.path, "1-scene1.md"))
+    assert scene.path in inotify.wait(1)
+    assert inotify.wait(0) == set()
+
+
+def test_follows_new_and_renamed_folders(novel, inotify):
+    path = novel.outline.path
+    folder = struct.Folder.create(os.path.join(path, "1-chapter1"))
+    assert folder.path in inotify.wait(1)
+
+    renamed = os.path.join(path, "2-chapter1")
+    os.rename(folder.path, renamed)
+    assert renamed in inotify.wait(1)
+
+    scene = struct.Scene.create(os.path.join(renamed, "1-scene1.md"))
+    assert scene.path in inotify.wait(1)
+
+
+def test_session_applies_watched_changes(novel, inotify):
+    scene = struct.Scene.create(os.path.join(novel.outline.path, "1-scene1.md"))
+    session = sess.Session(struct.Novel(novel.path), 100, 0, watcher=inotify)
+    inotify.wait(0.1)
+
+    scene.rewrite(body="three more words")
+    session.wait(1)
+    assert session.is_changed
+    assert session.count == 3
+
+    session.wait(0)
+    assert not session.is_changed
@@ -0,0 +1,72 @@
+import pytest
+
+import book.wordcount as wordcount
+
+TEXT = """# Chapter One
+
+It was a **dark** and stormy night.  The well-known story — again.
+<!-- a note
+   spanning lines -->
+* a list item
+---
+_done_ <!-- inline --> here
+"""
+
+
+def test_plain_matches_split():
+    assert wordcount.count_words(TEXT) == len(TEXT.split())
+
+
+def test_plain_file_matches_split(tmp_path):
+    # Plain mode takes the str.split() fast path; it must agree with the regex rules.
+    body = "a\u00a0b\u2003c\tword\u2014word well-known\x0b end\n"
+    path = tmp_path / "1-scene.md"
+    path.write_text(f"title:  scene\n\n{body}")
+    assert wordcount.count_file(path) == len(body.split()) == 6
+    for hyphens in wordcount.HYPHEN_POLICIES:
+        rules = wordcount.get_rules(hyphens=hyphens)
+        assert wordcount.count_file(path, rules) == wordcount._count_matches(
+            rules.word_pattern, body
+        )
+
+
+def test_plain_file_chunks(tmp_path):
+    body = "well-known wörds—and\u00a0more  words\n\n" * 50
+    path = tmp_path / "1-scene.md"
+    path.write_text(f"title:  scene\nID:  3\n\n{body}")
+    for hyphens in wordcount.HYPHEN_POLICIES:
+        rules = wordcount.get_rules(hyphens=hyphens)
+        expected = wordcount.count_words(body, rules)
+        for chunk_size in (1, 2, 3, 7, 64, 1 << 20):
+            assert wordcount._count_split_file(path, rules, chunk_size) == expected
+
+
+def test_markdown_rules():
+    rules = wordcount.get_rules(wordcount.MARKDOWN)
+    # It was a dark and stormy night The well-known story again a list item done here
+    assert wordcount.count_words(TEXT, rules) == 16
+
+
+def test_hyphen_split():
+    rules = wordcount.get_rules(hyphens=wordcount.HYPHENS_SPLIT)
+    assert wordcount.count_words("well-known word—word", rules) == 4
+    assert wordcount.count_words("well-known word—word") == 2
+
+
+def test_count_file_skips_header(tmp_path):
+    path = tmp_path / "1-scene.md"
+    body = "p1 with words\n\np2 more words\n"
+    path.write_text(f"\ntitle:  scene\nID:  3\n\n{body}")
+    assert wordcount.count_file(path) == 6
+    rules = wordcount.get_rules(wordcount.MARKDOWN)
+    assert wordcount.count_file(path, rules) == 6
+
+    (tmp_path / "empty.md").write_text("")
+    assert wordcount.count_file(tmp_path / "empty.md") == 0
+    (tmp_path / "header.md").write_text("title:  only a header\n")
+    assert wordcount.count_file(tmp_path / "header.md") == 0
+
+
+def test_unknown_rules():
+    with pytest.raises(ValueError):
+        wordcount.get_rules("nope")
@@ -0,0 +1,139 @@
+import hashlib
+import http.server
+import json
+import os.path
+import threading
+import time
+
+import pytest
+
+import book.world as world
+
+WIKI = """<html><body>
+<script class="tiddlywiki-tiddler-store" type="application/json">{}</script>
+</body></html>"""
+
+
+def make_wiki(*tiddlers):
+    return WIKI.format(json.dumps(list(tiddlers))).encode("utf8")
+
+
+@pytest.fixture
+def server():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        content = make_wiki({"title": "Gods", "text": "many"})
+        version = b""
+        requests = []
+
+        def do_GET(self):
+            etag = '"' + hashlib.md5(self.content + self.version).hexdigest() + '"'
+            self.requests.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(self.content)))
+            self.end_headers()
+            self.wfile.write(self.content)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_sync_is_conditional(novel, server):
+    url = f"http://127.0.0.1:{server.server_port}/wiki.html"
+    sync = world.WorldSync(url, novel)
+    index_path = os.path.join(
+        novel.world_building_path, world.TIDDLERS_DIR, world.INDEX_FILENAME
+    )
+
+    assert sync.sync()
+    assert sync.pop_changed()
+    assert not sync.pop_changed()
+    assert world.read_tiddler(novel.world_building_path, "Gods")["text"] == "many"
+    mtime = os.stat(index_path).st_mtime_ns
+
+    assert not sync.sync()
+    assert server.RequestHandlerClass.requests[-1] is not None
+    assert os.stat(index_path).st_mtime_ns == mtime
+
+    server.RequestHandlerClass.content = make_wiki({"title": "Gods", "text": "few"})
+    assert sync.sync()
+    assert world.read_tiddler(novel.world_building_path, "Gods")["text"] == "few"
+
+
+def test_new_validators_are_kept_for_unchanged_content(novel, server):
+    url = f"http://127.0.0.1:{server.server_port}/wiki.html"
+    sync = world.WorldSync(url, novel)
+    assert sync.sync()
+
+    # Same body under a new ETag: nothing to write, but the new ETag is what to send next.
+    server.RequestHandlerClass.version = b"2"
+    assert not sync.sync()
+    etag = sync.load_state()["etag"]
+    assert etag == '"' + hashlib.md5(server.RequestHandlerClass.content + b"2").hexdigest() + '"'
+    assert not sync.sync()
+    assert server.RequestHandlerClass.requests[-1] == etag
+
+
+def test_run_survives_any_sync_error(novel, monkeypatch):
+    sync = world.WorldSync("unused", novel, interval=0.01)
+    calls = []
+
+    def bad_sync():
+        calls.append(1)
+        raise KeyError("title")
+
+    monkeypatch.setattr(sync, "sync", bad_sync)
+    sync.start()
+    deadline = time.time() + 5
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(calls) >= 2
+    assert sync.is_alive()
+    assert isinstance(sync.last_error, KeyError)
+    sync.stop(timeout=5)
+
+
+def test_write_tiddlers_rewrites_only_changes(tmp_path):
+    world_path = str(tmp_path / "world")
+    os.makedirs(world_path)
+    with open(os.path.join(world_path, world.LEGACY_FILENAME), "w") as fp:
+        fp.write("[]")
+    tiddlers = [{"title": "$:/site title", "text": "a"}, {"title": "Gods", "text": "b"}]
+    assert world.write_tiddlers(world_path, tiddlers) == 3
+    assert not os.path.exists(os.path.join(world_path, world.LEGACY_FILENAME))
+
+    store_path = os.path.join(world_path, world.TIDDLERS_DIR)
+    title_path = os.path.join(store_path, world.tiddler_filename("$:/site title"))
+    assert "/" not in world.tiddler_filename("$:/site title")
+    mtime = os.stat(title_path).st_mtime_ns
+
+    assert world.write_tiddlers(world_path, tiddlers) == 0
+    tiddlers[1]["text"] = "changed"
+    assert world.write_tiddlers(world_path, tiddlers) == 1
+    assert os.stat(title_path).st_mtime_ns == mtime
+
+    assert world.write_tiddlers(world_path, tiddlers[1:]) == 1
+    assert not os.path.exists(title_path)
+    assert world.read_tiddler(world_path, "$:/site title") is None
+    assert sorted(os.listdir(store_path)) == sorted(
+        [world.INDEX_FILENAME, world.tiddler_filename("Gods")]
+    )
+
+
+def test_fetch_skips_unchanged_content_by_hash(tmp_path):
+    path = tmp_path / "wiki.html"
+    path.write_bytes(make_wiki({"title": "A", "text": "a"}))
+    state = {}
+    assert world.fetch(str(path), state) is not None
+    assert world.fetch(str(path), state) is None